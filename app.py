@@ -1,15 +1,29 @@
+import assets
 import database as db
-from flask import Flask, render_template, request, jsonify, send_from_directory
-import requests
+import library
+from flask import Flask, render_template, request, jsonify, send_from_directory, make_response, url_for
 import hmac
+import mimetypes
 import os
+import posixpath
 import re
 from functools import wraps
 from dotenv import load_dotenv
-from urllib.parse import urlparse, parse_qs
 import time
-from youtubesearchpython import VideosSearch
-import yt_dlp
+from downloader import (
+    sanitize_filename,
+    track_filename,
+    search_youtube_video,
+    fetch_video_info,
+    fetch_playlist_info,
+    extract_video_id,
+    resolve_video,
+    resolve_track,
+    Lookahead,
+    download_shared,
+    zip_playlist_folder,
+    zip_files,
+)
 
 load_dotenv()
 
@@ -19,55 +33,54 @@ app.secret_key = os.getenv('SECRET_KEY', os.urandom(24).hex())
 # Configuration
 DOWNLOAD_FOLDER = os.getenv('DOWNLOAD_FOLDER', 'downloads')
 ALLOW_SERVER_STORAGE = os.getenv('ALLOW_SERVER_STORAGE', 'false').lower() == 'true'
+# Hand every download to the worker queue so this process only serves the UI and files
+USE_JOB_QUEUE = os.getenv('USE_JOB_QUEUE', 'false').lower() == 'true'
 ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
 ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD')
-
-# Create downloads folder
-os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def new_progress(total=0, status='idle', playlist_name='', playlist_url='', tracks_info=None):
+    """Build a fresh progress tracker for one playlist run."""
+    return {
+        'current': 0,
+        'total': total,
+        'current_track': '',
+        'status': status,
+        'completed': [],
+        'failed': [],
+        'should_stop': False,
+        'playlist_name': playlist_name,
+        'playlist_url': playlist_url,
+        'tracks_info': tracks_info or []
+    }
 
 # Global progress tracker
-download_progress = {
-    'current': 0,
-    'total': 0,
-    'current_track': '',
-    'status': 'idle',
-    'completed': [],
-    'failed': [],
-    'should_stop': False,
-    'playlist_name': '',
-    'playlist_url': '',
-    'tracks_info': []
-}
-
-def sanitize_filename(filename):
-    """Clean filename for safe file system storage"""
-    # Remove invalid characters
-    filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-    # Limit length
-    filename = filename[:200]
-    return filename.strip()
-
-
-def get_request_ip():
+download_progress = new_progress()
+
+
+# The helpers below take the current request as an argument so asgi.py can
+# pass Quart's; both frameworks share werkzeug's request API.
+
+def get_request_ip(req=request):
     """Resolve the client IP, preferring the forwarded address when present."""
-    forwarded_for = request.headers.get('X-Forwarded-For', '')
+    forwarded_for = req.headers.get('X-Forwarded-For', '')
     if forwarded_for:
         return forwarded_for.split(',')[0].strip()
-    return request.remote_addr
+    return req.remote_addr
 
 
-def admin_auth_required_response():
+def admin_auth_required_response(req=request):
     """Return an HTTP Basic auth challenge for the admin area."""
-    is_api_request = request.path.startswith('/api/')
+    is_api_request = req.path.startswith('/api/')
     payload = {'error': 'Admin authentication required'} if is_api_request else 'Admin authentication required'
     status = 401
     headers = {'WWW-Authenticate': 'Basic realm="Admin Dashboard"'}
     return payload, status, headers
 
 
-def is_admin_authorized():
+def is_admin_authorized(req=request):
     """Validate the HTTP Basic credentials for the admin area."""
-    auth = request.authorization
+    auth = req.authorization
 
     if not ADMIN_PASSWORD or not auth:
         return False
@@ -88,61 +101,491 @@ def require_admin_password(view_func):
 
     return wrapped
 
+
+def create_app():
+    """Run the start-up side effects kept out of import time and return the app.
+
+    Use as the server entry point, e.g. ``gunicorn 'app:create_app()'``.
+    """
+    # Create downloads folder
+    os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+    db.init_db()
+    return app
+
+@app.template_global()
+def asset_url(filename):
+    """URL of a static asset that changes whenever its content does."""
+    return url_for('static', **assets.static_url_args(filename, app.static_folder))
+
+
+def serve_static(filename):
+    """Serve static files, caching fingerprinted assets for good.
+
+    Built assets are sent as their precompressed variant when the client
+    accepts it.
+    """
+    variant = assets.precompressed_variant(filename, request.headers.get('Accept-Encoding'), app.static_folder)
+    if variant:
+        variant_name, encoding = variant
+        response = send_from_directory(app.static_folder, variant_name, mimetype=mimetypes.guess_type(filename)[0])
+        response.content_encoding = encoding
+    else:
+        response = send_from_directory(app.static_folder, filename)
+
+    if assets.is_fingerprinted(filename, request.args.get('v'), app.static_folder):
+        response.headers['Cache-Control'] = assets.IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+app.view_functions['static'] = serve_static
+
+
+def conditional_response(response, private=False):
+    """Tag a response with a content ETag and answer 304 when the client's copy matches.
+
+    ``no-cache`` still lets browsers store it, but they revalidate first, so
+    an unchanged page costs an empty 304 instead of the full body.
+    """
+    response.add_etag()
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+    return response.make_conditional(request)
+
 @app.route('/')
 def index():
     """Serve main page"""
-    return render_template('index.html')
+    return conditional_response(make_response(render_template('index.html')))
 
 @app.route('/api/config', methods=['GET'])
 def get_config():
     """Get app configuration"""
-    return jsonify({
-        'allow_server_storage': ALLOW_SERVER_STORAGE
+    return conditional_response(jsonify({
+        'allow_server_storage': ALLOW_SERVER_STORAGE,
+        'job_queue': USE_JOB_QUEUE
+    }))
+
+def parse_imported_tracks(tracks_info):
+    """Normalize the imported TXT/CSV rows into name/artist pairs."""
+    return [
+        {
+            'name': str(track.get('name', '')).strip(),
+            'artist': str(track.get('artist') or 'Unknown').strip()
+        }
+        for track in tracks_info
+        if str(track.get('name', '')).strip()
+    ]
+
+
+def playlist_videos(playlist_info):
+    """Turn flat playlist entries into the title/url list used for downloads."""
+    videos_info = []
+    for entry in playlist_info.get('entries') or []:
+        if entry:
+            videos_info.append({
+                'title': entry.get('title', 'Unknown'),
+                'url': f"https://www.youtube.com/watch?v={entry.get('id', '')}"
+            })
+    return videos_info
+
+
+class RequestError(Exception):
+    """Invalid request input, answered with ``{'error': message}`` and status (400 by default)."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def require_in_process_downloads():
+    """Refuse to download inside the web process when workers do it instead."""
+    if USE_JOB_QUEUE:
+        raise RequestError('Downloads run on the worker queue; submit them to /api/jobs', 409)
+
+
+def parse_playlist_download(data):
+    """Validate an /api/download body; returns (tracks_info, playlist_name)."""
+    tracks_info = data.get('tracks') or []
+    if not tracks_info:
+        raise RequestError('Import a TXT or CSV playlist file first.')
+
+    tracks_info = parse_imported_tracks(tracks_info)
+    if not tracks_info:
+        raise RequestError('No valid songs were found in the imported file.')
+
+    return tracks_info, sanitize_filename(data.get('playlist_name') or 'imported-playlist')
+
+
+def parse_youtube_url(data):
+    """Validate the single-video URL of an /api/youtube/download body."""
+    youtube_url = data.get('youtube_url')
+    if not youtube_url:
+        raise RequestError('YouTube URL is required')
+
+    if 'youtube.com' not in youtube_url and 'youtu.be' not in youtube_url:
+        raise RequestError('Invalid YouTube URL')
+
+    return youtube_url
+
+
+def parse_playlist_url(data, required=True):
+    """Validate a body's YouTube playlist URL; None when optional and absent."""
+    playlist_url = data.get('playlist_url')
+    if not playlist_url:
+        if required:
+            raise RequestError('Playlist URL is required')
+        return None
+
+    if 'youtube.com/playlist' not in playlist_url and 'youtu.be' not in playlist_url:
+        raise RequestError('Invalid YouTube playlist URL')
+
+    return playlist_url
+
+
+def start_progress(progress, resume, items, playlist_name, playlist_url=''):
+    """Return the tracker for a playlist run and the index to start from.
+
+    Resuming keeps the paused tracker and carries on after its last track.
+    """
+    if not resume:
+        return new_progress(len(items), 'downloading', playlist_name, playlist_url, items), 0
+
+    progress['should_stop'] = False
+    progress['status'] = 'downloading'
+    return progress, progress['current']
+
+
+def advance_progress(progress, idx, current_track):
+    """Move the tracker to item idx; returns False (and pauses) if a stop was requested."""
+    if progress['should_stop']:
+        progress['status'] = 'paused'
+        return False
+
+    progress['current'] = idx + 1
+    progress['current_track'] = current_track
+    return True
+
+
+def paused_payload(progress):
+    """Response body of a playlist run stopped at a track boundary."""
+    return {
+        'success': True,
+        'message': 'Download paused',
+        'completed': len(progress['completed']),
+        'failed': len(progress['failed']),
+        'paused': True
+    }
+
+
+def finished_payload(progress, noun):
+    """Response body of a playlist run saved on the server."""
+    return {
+        'success': True,
+        'message': f"Downloaded {len(progress['completed'])} of {progress['total']} {noun}",
+        'completed': len(progress['completed']),
+        'failed': len(progress['failed'])
+    }
+
+
+def log_playlist_finished(source_type, playlist_name, ip_address):
+    """Record the activity entry for a finished playlist run."""
+    if source_type == 'youtube_playlist':
+        db.log_activity('youtube_playlist_download', f"Processed playlist: {playlist_name}", ip_address)
+    else:
+        db.log_activity('imported_playlist_download', f"Processed imported playlist: {playlist_name}", ip_address)
+
+
+def log_video_download(video_title, youtube_url, ip_address):
+    """Record a successful single-video download."""
+    db.log_download('youtube', video_title, youtube_url, True, None, ip_address)
+    db.log_activity('youtube_download', f"Downloaded: {video_title}", ip_address)
+
+
+def log_job_created(playlist_name, items, ip_address):
+    """Record a job handed to the worker queue."""
+    db.log_activity('job_created', f"Queued {len(items)} items: {playlist_name or items[0]['title']}", ip_address)
+
+
+def playlist_info_payload(playlist_info):
+    """Response body of a playlist lookup."""
+    videos = []
+    for entry in playlist_info.get('entries', []):
+        if entry:
+            videos.append({
+                'title': entry.get('title', 'Unknown'),
+                'channel': entry.get('uploader', 'Unknown'),
+                'url': entry.get('url', '')
+            })
+
+    return {
+        'success': True,
+        'playlist': {
+            'name': playlist_info.get('title', 'Unknown Playlist'),
+            'description': playlist_info.get('description', ''),
+            'video_count': len(videos),
+            'thumbnail': playlist_info.get('thumbnail', ''),
+            'videos': videos
+        }
+    }
+
+
+def job_items(data, playlist_info=None, video_info=None):
+    """Turn a /api/jobs body into (source type, playlist name, task items).
+
+    ``playlist_info`` is the fetched playlist when the body names one, and
+    ``video_info`` the fetched video of a single ``youtube_url``, which is
+    saved to the top of the download folder like a direct download.
+    """
+    if video_info is not None:
+        playlist_name = ''
+        source_type = 'youtube'
+        items = [{'title': video_info.get('title', 'video'), 'source_url': data['youtube_url']}]
+    elif playlist_info is not None:
+        playlist_name = sanitize_filename(playlist_info.get('title', 'youtube_playlist'))
+        source_type = 'youtube_playlist'
+        items = [
+            {'title': video['title'], 'source_url': video['url']}
+            for video in playlist_videos(playlist_info)
+        ]
+    else:
+        playlist_name = sanitize_filename(data.get('playlist_name') or 'imported-playlist')
+        source_type = 'playlist'
+        items = [
+            {'title': track['name'], 'artist': track['artist']}
+            for track in parse_imported_tracks(data.get('tracks') or [])
+        ]
+
+    if not items:
+        raise RequestError('No tracks or videos to download.')
+
+    return source_type, playlist_name, items
+
+
+def artifact_path(playlist_name, filename):
+    """Path of a file under DOWNLOAD_FOLDER as served by /downloads/<path>."""
+    return posixpath.join(playlist_name, filename)
+
+
+def mark_items_in_library(playlist_name, format_type, items):
+    """Point items already in the playlist folder at their file so no worker fetches them again."""
+    playlist_folder = os.path.join(DOWNLOAD_FOLDER, playlist_name)
+    if not os.path.isdir(playlist_folder):
+        return items
+
+    for item in items:
+        path = library.find_track(playlist_folder, track_filename(item['title'], item.get('artist')), format_type)
+        if path:
+            item['artifact_path'] = artifact_path(playlist_name, os.path.basename(path))
+    return items
+
+
+def begin_artifact_upload(task_id, lease_token, name):
+    """Check a worker's artifact upload against its lease and choose where the file goes.
+
+    The request body is written to the returned ``temp_path``, then
+    ``finish_artifact_upload`` moves it into the playlist folder.
+    """
+    task = db.get_leased_task(task_id, lease_token) if lease_token else None
+    if task is None:
+        raise RequestError('Task is not leased with this token', 409)
+
+    stem, extension = os.path.splitext(os.path.basename(name or ''))
+    filename = sanitize_filename(stem) + re.sub(r'[^A-Za-z0-9.]', '', extension)
+    if not stem or filename.startswith('.'):
+        raise RequestError('A file name is required')
+
+    import tempfile
+
+    playlist_folder = os.path.join(DOWNLOAD_FOLDER, task['playlist_name'])
+    os.makedirs(playlist_folder, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(prefix='.upload-', dir=playlist_folder)
+    os.close(handle)
+
+    return {
+        'task': task,
+        'path': os.path.join(playlist_folder, filename),
+        'artifact_path': artifact_path(task['playlist_name'], filename),
+        'temp_path': temp_path,
+    }
+
+
+def finish_artifact_upload(upload, video_id=None):
+    """Publish a fully received upload and index it; returns its artifact path."""
+    os.replace(upload['temp_path'], upload['path'])
+    library.record_download(upload['path'], video_id or None, upload['task']['format'])
+    return upload['artifact_path']
+
+
+def discard_artifact_upload(upload):
+    """Remove the partial file of a failed upload."""
+    try:
+        os.remove(upload['temp_path'])
+    except OSError:
+        pass
+
+
+def job_archive_files(job):
+    """Paths of a job's finished files for a ZIP download; raises RequestError if there are none."""
+    if job is None:
+        raise RequestError('Job not found', 404)
+
+    files = [
+        os.path.join(DOWNLOAD_FOLDER, *task['artifact_path'].split('/'))
+        for task in job['tasks']
+        if task['artifact_path']
+    ]
+    if not files:
+        raise RequestError('No finished files to download yet', 409)
+
+    return files
+
+
+def job_archive_name(job):
+    """Download name of a job's ZIP archive."""
+    name = job['playlist_name'] or f"job-{job['id']}"
+    return f'{name}.zip'
+
+
+def job_payload(job, build_url):
+    """Response body of a job, with a download link per finished task."""
+    for task in job['tasks']:
+        if task['artifact_path']:
+            task['download_url'] = build_url('download_file', filename=task['artifact_path'])
+    return job
+
+
+def download_track(progress, track, playlist_folder, playlist_name, format_type, ip_address, use_library=True,
+                   resolve=None):
+    """Resolve and download one imported track, recording the outcome.
+
+    With ``use_library`` a file already indexed in the playlist folder counts
+    as done without touching YouTube. ``resolve`` returns the track's
+    (watch URL, video ID), e.g. from a lookahead; by default it searches now.
+    """
+    track_name = f"{track['artist']} - {track['name']}"
+
+    # Check if already downloaded, or already reported as unresolvable
+    if track_name in progress['completed'] or is_failed(progress, track_name):
+        return
+
+    filename = sanitize_filename(track_name)
+    if use_library and library.find_track(playlist_folder, filename, format_type):
+        progress['completed'].append(track_name)
+        return
+
+    # A lookahead returns None for tracks it skipped as already on disk; if it
+    # hit an error (e.g. a network blip), search again now
+    resolved = None
+    if resolve:
+        try:
+            resolved = resolve()
+        except Exception as e:
+            print(f"Lookahead error for {track_name}, searching again: {e}")
+
+    # Search YouTube; only an empty result means the video does not exist
+    try:
+        video_url, video_id = resolved or resolve_video(search_youtube_video(track['name'], track['artist']))
+    except Exception as e:
+        print(f"Search error for {track_name}: {e}")
+        fail_download(progress, track_name, playlist_name, ip_address)
+        return
+
+    if not video_url:
+        fail_unresolved(progress, track_name, playlist_name, ip_address)
+        return
+
+    # Download from YouTube to playlist folder
+    try:
+        output_path = download_shared(video_url, video_id, os.path.join(playlist_folder, filename), format_type)
+    except Exception as e:
+        print(f"Download error for {track_name}: {e}")
+        fail_download(progress, track_name, playlist_name, ip_address)
+        return
+
+    progress['completed'].append(track_name)
+    db.log_download('playlist', track_name, playlist_name, True, None, ip_address)
+    if use_library:
+        library.record_download(output_path, video_id, format_type)
+
+
+def is_failed(progress, track_name):
+    """Whether a track has already been recorded as failed in this run."""
+    return any(item['track'] == track_name for item in progress['failed'])
+
+
+def fail_unresolved(progress, track_name, playlist_name, ip_address):
+    """Record a track no YouTube video could be found for."""
+    progress['failed'].append({
+        'track': track_name,
+        'reason': 'YouTube video not found'
+    })
+    db.log_download('playlist', track_name, playlist_name, False, 'YouTube video not found', ip_address)
+
+
+def fail_download(progress, track_name, playlist_name, ip_address):
+    """Record a track whose search or download raised."""
+    progress['failed'].append({
+        'track': track_name,
+        'reason': 'Download failed'
     })
+    db.log_download('playlist', track_name, playlist_name, False, 'Download failed', ip_address)
+
+
+def track_lookahead(tracks_info, playlist_folder, format_type, use_library=True):
+    """Resolve upcoming tracks (video ID and formats) while the current one downloads.
+
+    Tracks already in the library are not searched at all.
+    """
+    def prefetch(track):
+        filename = sanitize_filename(f"{track['artist']} - {track['name']}")
+        if use_library and library.find_track(playlist_folder, filename, format_type):
+            return None
+        return resolve_track(track['name'], track['artist'])
 
-def search_youtube_video(song_name, artist):
-    """Find best matching YouTube video"""
-    query = f"{artist} {song_name} official audio".strip()
-    return f"ytsearch1:{query}"
+    return Lookahead(tracks_info, prefetch)
+
+
+def report_unresolved_tracks(progress, lookahead, start_index, playlist_name, ip_address):
+    """Fail tracks ahead of start_index whose search came back empty, before their turn.
+
+    Only a real empty result counts; a lookahead that raised is retried when
+    the track's turn comes.
+    """
+    for index, outcome in lookahead.finished(start_index):
+        track = lookahead.items[index]
+        track_name = f"{track['artist']} - {track['name']}"
+        unresolved = isinstance(outcome, tuple) and not outcome[0]
+        if unresolved and not is_failed(progress, track_name) and track_name not in progress['completed']:
+            fail_unresolved(progress, track_name, playlist_name, ip_address)
+
+
+def download_playlist_video(progress, video, playlist_folder, playlist_url, format_type, ip_address, use_library=True):
+    """Download one YouTube playlist entry, recording the outcome."""
+    # Check if already downloaded
+    if video['title'] in progress['completed']:
+        return
+
+    filename = sanitize_filename(video['title'])
+    if use_library and library.find_track(playlist_folder, filename, format_type):
+        progress['completed'].append(video['title'])
+        return
 
-def download_from_youtube(youtube_url, artist, track_name, download_folder=DOWNLOAD_FOLDER, format_type='mp3'):
-    """Download MP3 or MP4 using yt-dlp"""
     try:
-        filename = sanitize_filename(f"{artist} - {track_name}")
-        filepath = os.path.join(download_folder, filename)
-
-        # Configure yt-dlp options based on format
-        if format_type == 'mp4':
-            # Download video (MP4)
-            ydl_opts = {
-                'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-                'outtmpl': filepath,
-                'quiet': True,
-                'no_warnings': True,
-                'merge_output_format': 'mp4',
-            }
-        else:
-            # Download audio only (MP3)
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-                'outtmpl': filepath,
-                'quiet': True,
-                'no_warnings': True,
-            }
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([youtube_url])
-
-        return True
+        video_id = extract_video_id(video['url'])
+        output_path = download_shared(video['url'], video_id, os.path.join(playlist_folder, filename), format_type)
+
+        progress['completed'].append(video['title'])
+        db.log_download('youtube_playlist', video['title'], playlist_url, True, None, ip_address)
+        if use_library:
+            library.record_download(output_path, video_id, format_type)
 
     except Exception as e:
-        print(f"Download error for {artist} - {track_name}: {e}")
-        return False
+        progress['failed'].append({
+            'track': video['title'],
+            'reason': str(e)
+        })
+        db.log_download('youtube_playlist', video['title'], playlist_url, False, str(e), ip_address)
 
 @app.route('/api/download', methods=['POST'])
 def download_playlist():
@@ -150,28 +593,13 @@ def download_playlist():
     global download_progress
 
     try:
+        require_in_process_downloads()
         data = request.get_json(silent=True) or {}
-        tracks_info = data.get('tracks') or []
-        playlist_name = sanitize_filename(data.get('playlist_name') or 'imported-playlist')
+        tracks_info, playlist_name = parse_playlist_download(data)
         resume = data.get('resume', False)
         download_to_device = data.get('download_to_device', False)
         format_type = data.get('format', 'mp3')  # Default to mp3
 
-        if not tracks_info:
-            return jsonify({'error': 'Import a TXT or CSV playlist file first.'}), 400
-
-        tracks_info = [
-            {
-                'name': str(track.get('name', '')).strip(),
-                'artist': str(track.get('artist') or 'Unknown').strip()
-            }
-            for track in tracks_info
-            if str(track.get('name', '')).strip()
-        ]
-
-        if not tracks_info:
-            return jsonify({'error': 'No valid songs were found in the imported file.'}), 400
-
         # Choose download location
         if download_to_device:
             import tempfile
@@ -181,147 +609,75 @@ def download_playlist():
             os.makedirs(playlist_folder, exist_ok=True)
 
         # If not resuming, reset progress
-        if not resume:
-            download_progress = {
-                'current': 0,
-                'total': len(tracks_info),
-                'current_track': '',
-                'status': 'downloading',
-                'completed': [],
-                'failed': [],
-                'should_stop': False,
-                'playlist_name': playlist_name,
-                'playlist_url': '',
-                'tracks_info': tracks_info
-            }
-        else:
-            # Resuming - keep existing progress but reset stop flag
-            download_progress['should_stop'] = False
-            download_progress['status'] = 'downloading'
+        download_progress, start_index = start_progress(download_progress, resume, tracks_info, playlist_name)
 
         # Download each track
-        start_index = download_progress['current'] if resume else 0
-
-        for idx in range(start_index, len(tracks_info)):
-            # Check if should stop
-            if download_progress['should_stop']:
-                download_progress['status'] = 'paused'
-                return jsonify({
-                    'success': True,
-                    'message': 'Download paused',
-                    'completed': len(download_progress['completed']),
-                    'failed': len(download_progress['failed']),
-                    'paused': True
-                })
-
-            track = tracks_info[idx]
-            download_progress['current'] = idx + 1
-            download_progress['current_track'] = f"{track['artist']} - {track['name']}"
-
-            # Check if already downloaded
-            track_name = f"{track['artist']} - {track['name']}"
-            if track_name in download_progress['completed']:
-                continue
-
-            # Search YouTube
-            youtube_url = search_youtube_video(track['name'], track['artist'])
-
-            if not youtube_url:
-                download_progress['failed'].append({
-                    'track': track_name,
-                    'reason': 'YouTube video not found'
-                })
-                db.log_download(
-                    'playlist',
-                    track_name,
-                    playlist_name,
-                    False,
-                    'YouTube video not found',
-                    get_request_ip()
-                )
-                continue
-
-            # Download from YouTube to playlist folder
-            success = download_from_youtube(youtube_url, track['artist'], track['name'], playlist_folder, format_type)
-
-            if success:
-                download_progress['completed'].append(track_name)
-                db.log_download(
-                    'playlist',
-                    track_name,
-                    playlist_name,
-                    True,
-                    None,
-                    get_request_ip()
-                )
-            else:
-                download_progress['failed'].append({
-                    'track': track_name,
-                    'reason': 'Download failed'
-                })
-                db.log_download(
-                    'playlist',
-                    track_name,
-                    playlist_name,
-                    False,
-                    'Download failed',
-                    get_request_ip()
+        ip_address = get_request_ip()
+        lookahead = track_lookahead(tracks_info, playlist_folder, format_type, use_library=not download_to_device)
+
+        try:
+            for idx in range(start_index, len(tracks_info)):
+                track = tracks_info[idx]
+                if not advance_progress(download_progress, idx, f"{track['artist']} - {track['name']}"):
+                    return jsonify(paused_payload(download_progress))
+
+                lookahead.schedule(idx)
+
+                download_track(
+                    download_progress, track, playlist_folder, playlist_name, format_type, ip_address,
+                    use_library=not download_to_device,
+                    resolve=lambda idx=idx: lookahead.result(idx)
                 )
+                report_unresolved_tracks(download_progress, lookahead, idx + 1, playlist_name, ip_address)
 
-            # Small delay to avoid rate limits
-            time.sleep(1)
+                # Small delay to avoid rate limits
+                time.sleep(1)
+        finally:
+            lookahead.close()
 
         download_progress['status'] = 'completed'
-        db.log_activity(
-            'imported_playlist_download',
-            f"Processed imported playlist: {playlist_name}",
-            get_request_ip()
-        )
+        log_playlist_finished('playlist', playlist_name, ip_address)
 
         if download_to_device:
-            # Create ZIP file and send to client
-            import zipfile
-            import tempfile
-            import shutil
+            return send_playlist_archive(playlist_folder, playlist_name, format_type)
+        else:
+            return jsonify(finished_payload(download_progress, 'tracks'))
 
-            zip_path = os.path.join(tempfile.gettempdir(), f'{playlist_name}.zip')
+    except RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        download_progress['status'] = 'error'
+        return jsonify({'error': str(e)}), 500
 
-            file_extension = '.mp4' if format_type == 'mp4' else '.mp3'
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(playlist_folder):
-                    for file in files:
-                        if file.endswith(file_extension):
-                            file_path = os.path.join(root, file)
-                            zipf.write(file_path, file)
 
-            response = send_from_directory(
-                os.path.dirname(zip_path),
-                os.path.basename(zip_path),
-                as_attachment=True,
-                download_name=f'{playlist_name}.zip'
-            )
+def send_playlist_archive(playlist_folder, playlist_name, format_type):
+    """Zip a temporary playlist folder and stream it to the client."""
+    import tempfile
+    import shutil
 
-            # Clean up temp files after sending
-            @response.call_on_close
-            def cleanup():
-                try:
-                    shutil.rmtree(playlist_folder)
-                    os.remove(zip_path)
-                except:
-                    pass
+    zip_path = zip_playlist_folder(
+        playlist_folder,
+        os.path.join(tempfile.gettempdir(), f'{playlist_name}.zip'),
+        format_type
+    )
 
-            return response
-        else:
-            return jsonify({
-                'success': True,
-                'message': f"Downloaded {len(download_progress['completed'])} of {download_progress['total']} tracks",
-                'completed': len(download_progress['completed']),
-                'failed': len(download_progress['failed'])
-            })
+    response = send_from_directory(
+        os.path.dirname(zip_path),
+        os.path.basename(zip_path),
+        as_attachment=True,
+        download_name=f'{playlist_name}.zip'
+    )
 
-    except Exception as e:
-        download_progress['status'] = 'error'
-        return jsonify({'error': str(e)}), 500
+    # Clean up temp files after sending
+    @response.call_on_close
+    def cleanup():
+        try:
+            shutil.rmtree(playlist_folder)
+            os.remove(zip_path)
+        except:
+            pass
+
+    return response
 
 @app.route('/api/progress', methods=['GET'])
 def get_progress():
@@ -350,27 +706,15 @@ def resume_download():
 def download_youtube_direct():
     """Download a single YouTube video directly to downloads folder or send to client"""
     try:
+        require_in_process_downloads()
         data = request.get_json()
-        youtube_url = data.get('youtube_url')
+        youtube_url = parse_youtube_url(data)
         download_to_device = data.get('download_to_device', False)
         format_type = data.get('format', 'mp3')  # Default to mp3
 
-        if not youtube_url:
-            return jsonify({'error': 'YouTube URL is required'}), 400
-
-        # Validate YouTube URL
-        if 'youtube.com' not in youtube_url and 'youtu.be' not in youtube_url:
-            return jsonify({'error': 'Invalid YouTube URL'}), 400
-
         # Get video info first to extract title
-        ydl_opts_info = {
-            'quiet': True,
-            'no_warnings': True,
-        }
-
-        with yt_dlp.YoutubeDL(ydl_opts_info) as ydl:
-            info = ydl.extract_info(youtube_url, download=False)
-            video_title = sanitize_filename(info.get('title', 'video'))
+        info = fetch_video_info(youtube_url)
+        video_title = sanitize_filename(info.get('title', 'video'))
 
         # Choose download location based on preference
         if download_to_device:
@@ -382,55 +726,17 @@ def download_youtube_direct():
             # Download directly to downloads folder
             filepath = os.path.join(DOWNLOAD_FOLDER, video_title)
 
-        # Configure yt-dlp options based on format
-        if format_type == 'mp4':
-            # Download video (MP4)
-            ydl_opts = {
-                'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-                'outtmpl': filepath,
-                'quiet': True,
-                'no_warnings': True,
-                'merge_output_format': 'mp4',
-            }
-        else:
-            # Download audio only (MP3)
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-                'outtmpl': filepath,
-                'quiet': True,
-                'no_warnings': True,
-            }
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([youtube_url])
-
-        db.log_download(
-            "youtube",
-            video_title,
-            youtube_url,
-            True,
-            None,
-            get_request_ip()
-        )
-        db.log_activity(
-            "youtube_download",
-            f"Downloaded: {video_title}",
-            get_request_ip()
-        )
+        output_path = download_shared(youtube_url, info.get('id'), filepath, format_type)
+        log_video_download(video_title, youtube_url, get_request_ip())
 
+        filename = f'{video_title}{os.path.splitext(output_path)[1]}'
         if download_to_device:
             # Send file to client
-            file_extension = '.mp4' if format_type == 'mp4' else '.mp3'
             response = send_from_directory(
                 temp_dir,
-                f'{video_title}{file_extension}',
+                filename,
                 as_attachment=True,
-                download_name=f'{video_title}{file_extension}'
+                download_name=filename
             )
 
             # Clean up temp file after sending
@@ -444,13 +750,14 @@ def download_youtube_direct():
 
             return response
         else:
-            file_extension = '.mp4' if format_type == 'mp4' else '.mp3'
             return jsonify({
                 'success': True,
                 'message': f'Successfully downloaded: {video_title}',
-                'filename': f'{video_title}{file_extension}'
+                'filename': filename
             })
 
+    except RequestError as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         db.log_download(
             "youtube",
@@ -471,55 +778,24 @@ def download_file(filename):
 def get_youtube_playlist_info():
     """Get YouTube playlist metadata"""
     try:
-        data = request.get_json()
-        playlist_url = data.get('playlist_url')
-
-        if not playlist_url:
-            return jsonify({'error': 'Playlist URL is required'}), 400
-
-        # Validate YouTube playlist URL
-        if 'youtube.com/playlist' not in playlist_url and 'youtu.be' not in playlist_url:
-            return jsonify({'error': 'Invalid YouTube playlist URL'}), 400
+        playlist_url = parse_playlist_url(request.get_json())
 
         # Extract playlist info using yt-dlp
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': True,  # Don't download, just extract info
-        }
+        playlist_info = fetch_playlist_info(playlist_url)
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            playlist_info = ydl.extract_info(playlist_url, download=False)
-
-            if not playlist_info:
-                return jsonify({'error': 'Failed to fetch playlist information'}), 500
-
-            videos = []
-            for entry in playlist_info.get('entries', []):
-                if entry:
-                    videos.append({
-                        'title': entry.get('title', 'Unknown'),
-                        'channel': entry.get('uploader', 'Unknown'),
-                        'url': entry.get('url', '')
-                    })
-
-            db.log_activity(
-                'youtube_playlist_lookup',
-                f"Fetched playlist info: {playlist_info.get('title', 'Unknown Playlist')}",
-                get_request_ip()
-            )
+        if not playlist_info:
+            return jsonify({'error': 'Failed to fetch playlist information'}), 500
 
-            return jsonify({
-                'success': True,
-                'playlist': {
-                    'name': playlist_info.get('title', 'Unknown Playlist'),
-                    'description': playlist_info.get('description', ''),
-                    'video_count': len(videos),
-                    'thumbnail': playlist_info.get('thumbnail', ''),
-                    'videos': videos
-                }
-            })
+        db.log_activity(
+            'youtube_playlist_lookup',
+            f"Fetched playlist info: {playlist_info.get('title', 'Unknown Playlist')}",
+            get_request_ip()
+        )
+
+        return jsonify(playlist_info_payload(playlist_info))
 
+    except RequestError as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -529,30 +805,16 @@ def download_youtube_playlist():
     global download_progress
 
     try:
+        require_in_process_downloads()
         data = request.get_json()
-        playlist_url = data.get('playlist_url')
+        playlist_url = parse_playlist_url(data)
         resume = data.get('resume', False)
         download_to_device = data.get('download_to_device', False)
         format_type = data.get('format', 'mp3')
 
-        if not playlist_url:
-            return jsonify({'error': 'Playlist URL is required'}), 400
-
-        # Validate YouTube playlist URL
-        if 'youtube.com/playlist' not in playlist_url and 'youtu.be' not in playlist_url:
-            return jsonify({'error': 'Invalid YouTube playlist URL'}), 400
-
         # Extract playlist info
-        ydl_opts_info = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': True,
-        }
-
-        with yt_dlp.YoutubeDL(ydl_opts_info) as ydl:
-            playlist_info = ydl.extract_info(playlist_url, download=False)
-            playlist_name = sanitize_filename(playlist_info.get('title', 'youtube_playlist'))
-            entries = playlist_info.get('entries', [])
+        playlist_info = fetch_playlist_info(playlist_url)
+        playlist_name = sanitize_filename(playlist_info.get('title', 'youtube_playlist'))
 
         # Choose download location
         if download_to_device:
@@ -563,168 +825,129 @@ def download_youtube_playlist():
             os.makedirs(playlist_folder, exist_ok=True)
 
         # Prepare video list
-        videos_info = []
-        for entry in entries:
-            if entry:
-                videos_info.append({
-                    'title': entry.get('title', 'Unknown'),
-                    'url': f"https://www.youtube.com/watch?v={entry.get('id', '')}"
-                })
+        videos_info = playlist_videos(playlist_info)
 
         # If not resuming, reset progress
-        if not resume:
-            download_progress = {
-                'current': 0,
-                'total': len(videos_info),
-                'current_track': '',
-                'status': 'downloading',
-                'completed': [],
-                'failed': [],
-                'should_stop': False,
-                'playlist_name': playlist_name,
-                'playlist_url': playlist_url,
-                'tracks_info': videos_info
-            }
-        else:
-            download_progress['should_stop'] = False
-            download_progress['status'] = 'downloading'
+        download_progress, start_index = start_progress(
+            download_progress, resume, videos_info, playlist_name, playlist_url
+        )
 
         # Download each video
-        start_index = download_progress['current'] if resume else 0
+        ip_address = get_request_ip()
 
         for idx in range(start_index, len(videos_info)):
-            # Check if should stop
-            if download_progress['should_stop']:
-                download_progress['status'] = 'paused'
-                return jsonify({
-                    'success': True,
-                    'message': 'Download paused',
-                    'completed': len(download_progress['completed']),
-                    'failed': len(download_progress['failed']),
-                    'paused': True
-                })
-
             video = videos_info[idx]
-            download_progress['current'] = idx + 1
-            download_progress['current_track'] = video['title']
-
-            # Check if already downloaded
-            if video['title'] in download_progress['completed']:
-                continue
-
-            try:
-                # Download video
-                filename = sanitize_filename(video['title'])
-                filepath = os.path.join(playlist_folder, filename)
-
-                # Configure yt-dlp options based on format
-                if format_type == 'mp4':
-                    ydl_opts = {
-                        'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-                        'outtmpl': filepath,
-                        'quiet': True,
-                        'no_warnings': True,
-                        'merge_output_format': 'mp4',
-                    }
-                else:
-                    ydl_opts = {
-                        'format': 'bestaudio/best',
-                        'postprocessors': [{
-                            'key': 'FFmpegExtractAudio',
-                            'preferredcodec': 'mp3',
-                            'preferredquality': '192',
-                        }],
-                        'outtmpl': filepath,
-                        'quiet': True,
-                        'no_warnings': True,
-                    }
-
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([video['url']])
-
-                download_progress['completed'].append(video['title'])
-                db.log_download(
-                    'youtube_playlist',
-                    video['title'],
-                    playlist_url,
-                    True,
-                    None,
-                    get_request_ip()
-                )
+            if not advance_progress(download_progress, idx, video['title']):
+                return jsonify(paused_payload(download_progress))
 
-            except Exception as e:
-                download_progress['failed'].append({
-                    'track': video['title'],
-                    'reason': str(e)
-                })
-                db.log_download(
-                    'youtube_playlist',
-                    video['title'],
-                    playlist_url,
-                    False,
-                    str(e),
-                    get_request_ip()
-                )
+            download_playlist_video(
+                download_progress, video, playlist_folder, playlist_url, format_type, ip_address,
+                use_library=not download_to_device
+            )
 
             # Small delay to avoid rate limits
             time.sleep(1)
 
         download_progress['status'] = 'completed'
-        db.log_activity(
-            "youtube_playlist_download",
-            f"Processed playlist: {playlist_name}",
-            get_request_ip()
-        )
+        log_playlist_finished('youtube_playlist', playlist_name, ip_address)
 
         if download_to_device:
-            # Create ZIP file and send to client
-            import zipfile
-            import shutil
+            return send_playlist_archive(playlist_folder, playlist_name, format_type)
+        else:
+            return jsonify(finished_payload(download_progress, 'videos'))
 
-            zip_path = os.path.join(tempfile.gettempdir(), f'{playlist_name}.zip')
+    except RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        download_progress['status'] = 'error'
+        return jsonify({'error': str(e)}), 500
 
-            file_extension = '.mp4' if format_type == 'mp4' else '.mp3'
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(playlist_folder):
-                    for file in files:
-                        if file.endswith(file_extension):
-                            file_path = os.path.join(root, file)
-                            zipf.write(file_path, file)
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue an imported or YouTube playlist, or a single video, for the worker pool"""
+    try:
+        data = request.get_json(silent=True) or {}
+        youtube_url = parse_youtube_url(data) if data.get('youtube_url') else None
+        video_info = fetch_video_info(youtube_url) if youtube_url else None
+        playlist_url = parse_playlist_url(data, required=False)
+        playlist_info = fetch_playlist_info(playlist_url) if playlist_url else None
+        source_type, playlist_name, items = job_items(data, playlist_info, video_info)
+        format_type = data.get('format', 'mp3')
+        mark_items_in_library(playlist_name, format_type, items)
 
-            response = send_from_directory(
-                os.path.dirname(zip_path),
-                os.path.basename(zip_path),
-                as_attachment=True,
-                download_name=f'{playlist_name}.zip'
-            )
+        job_id = db.create_job(
+            source_type, playlist_name, format_type, items, playlist_url or youtube_url, get_request_ip()
+        )
+        log_job_created(playlist_name, items, get_request_ip())
 
-            # Clean up temp files after sending
-            @response.call_on_close
-            def cleanup():
-                try:
-                    shutil.rmtree(playlist_folder)
-                    os.remove(zip_path)
-                except:
-                    pass
+        return jsonify({'success': True, 'job_id': job_id, 'total': len(items)}), 202
 
-            return response
-        else:
-            return jsonify({
-                'success': True,
-                'message': f"Downloaded {len(download_progress['completed'])} of {download_progress['total']} videos",
-                'completed': len(download_progress['completed']),
-                'failed': len(download_progress['failed'])
-            })
+    except RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get queued job progress and finished artifacts"""
+    job = db.get_job(job_id)
+
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
 
+    return jsonify(job_payload(job, url_for))
+
+@app.route('/api/jobs/<int:job_id>/archive', methods=['GET'])
+def get_job_archive(job_id):
+    """Download the finished files of a job as one ZIP"""
+    import tempfile
+    import shutil
+
+    try:
+        job = db.get_job(job_id)
+        files = job_archive_files(job)
+    except RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+
+    archive_dir = tempfile.mkdtemp()
+    archive_name = job_archive_name(job)
+    zip_files(files, os.path.join(archive_dir, archive_name))
+
+    response = send_from_directory(archive_dir, archive_name, as_attachment=True)
+
+    # Clean up the archive after sending
+    @response.call_on_close
+    def cleanup():
+        shutil.rmtree(archive_dir, ignore_errors=True)
+
+    return response
+
+@app.route('/api/tasks/<int:task_id>/artifact', methods=['PUT'])
+def upload_artifact(task_id):
+    """Receive the file a worker produced for a task it holds the lease on"""
+    import shutil
+
+    try:
+        upload = begin_artifact_upload(task_id, request.headers.get('X-Lease-Token'), request.args.get('name'))
+    except RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+
+    try:
+        with open(upload['temp_path'], 'wb') as handle:
+            shutil.copyfileobj(request.stream, handle, UPLOAD_CHUNK_SIZE)
+        return jsonify({
+            'success': True,
+            'artifact_path': finish_artifact_upload(upload, request.args.get('video_id'))
+        })
     except Exception as e:
-        download_progress['status'] = 'error'
+        discard_artifact_upload(upload)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/admin')
 @require_admin_password
 def admin_page():
     """Serve admin dashboard"""
-    return render_template('admin.html')
+    return conditional_response(make_response(render_template('admin.html')), private=True)
 
 # Admin API endpoints
 @app.route('/api/admin/stats', methods=['GET'])
@@ -751,4 +974,4 @@ def get_admin_downloads():
     return jsonify({'downloads': downloads})
 if __name__ == '__main__':
     port = int(os.getenv('FLASK_PORT', 5000))
-    app.run(debug=True, host='0.0.0.0', port=port)
+    create_app().run(debug=True, host='0.0.0.0', port=port)
@@ -0,0 +1,532 @@
+"""ASGI variant of the downloader app.
+
+Serves the same pages and API as ``app.py`` but with async handlers: every
+yt-dlp call, ZIP build and SQLite write runs in an executor so the event loop
+only ever waits on futures. Request parsing, validation and response bodies
+come from the helpers in ``app.py``; the handlers here only add the awaiting.
+Run it with an ASGI server, e.g.::
+
+    hypercorn asgi:app --bind 0.0.0.0:5000
+"""
+import asyncio
+import functools
+import mimetypes
+import os
+import shutil
+import tempfile
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from urllib.parse import quote
+
+from quart import Quart, Response, render_template, request, jsonify, send_from_directory, make_response, url_for
+
+import app as core
+import assets
+import database as db
+from downloader import (
+    sanitize_filename,
+    fetch_video_info,
+    fetch_playlist_info,
+    download_shared,
+    zip_playlist_folder,
+    zip_files,
+)
+
+app = Quart(__name__)
+app.secret_key = core.app.secret_key
+# Quart caps request bodies at 16 MB; like Flask, accept artifact uploads of any size
+app.config['MAX_CONTENT_LENGTH'] = core.app.config['MAX_CONTENT_LENGTH']
+
+# Downloads are the only long blocking calls, so they get a dedicated bounded
+# pool; short disk and SQLite work uses the loop's default executor.
+ASYNC_DOWNLOAD_WORKERS = int(os.getenv('ASYNC_DOWNLOAD_WORKERS', 8))
+download_executor = ThreadPoolExecutor(
+    max_workers=ASYNC_DOWNLOAD_WORKERS,
+    thread_name_prefix='download'
+)
+
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# Global progress tracker
+download_progress = core.new_progress()
+
+
+async def run_download(func, *args):
+    """Run a blocking yt-dlp step on the download pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(download_executor, functools.partial(func, *args))
+
+
+async def run_io(func, *args):
+    """Run a short blocking disk or SQLite call off the event loop."""
+    return await asyncio.to_thread(func, *args)
+
+
+def require_admin_password(view_func):
+    """Protect admin HTML and API routes with one shared password."""
+    @wraps(view_func)
+    async def wrapped(*args, **kwargs):
+        if not core.is_admin_authorized(request):
+            return core.admin_auth_required_response(request)
+        return await view_func(*args, **kwargs)
+
+    return wrapped
+
+
+def attachment_disposition(download_name):
+    """Content-Disposition options for download_name, encoded like werkzeug's send_file.
+
+    Non-ASCII names get an ASCII ``filename`` fallback plus an RFC 5987
+    ``filename*``, so titles in any script keep their name in every browser.
+    """
+    try:
+        download_name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='!#$&+-.^_`|~')}"}
+    return {'filename': download_name}
+
+
+def stream_file(path, download_name, cleanup_path=None):
+    """Stream a file in chunks read off-loop, removing cleanup_path afterwards."""
+    async def body():
+        handle = await run_io(open, path, 'rb')
+        try:
+            while True:
+                chunk = await run_io(handle.read, STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await run_io(handle.close)
+            if cleanup_path:
+                await run_io(remove_path, cleanup_path)
+
+    response = Response(
+        body(),
+        mimetype='application/octet-stream',
+        headers={'Content-Length': str(os.path.getsize(path))}
+    )
+    response.headers.set('Content-Disposition', 'attachment', **attachment_disposition(download_name))
+    return response
+
+
+def remove_path(path):
+    """Best-effort removal of a temporary file or folder."""
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+async def send_playlist_archive(playlist_folder, playlist_name, format_type):
+    """Zip a temporary playlist folder off-loop and stream it to the client."""
+    archive_dir = await run_io(tempfile.mkdtemp)
+    zip_path = await run_io(
+        zip_playlist_folder,
+        playlist_folder,
+        os.path.join(archive_dir, f'{playlist_name}.zip'),
+        format_type
+    )
+    await run_io(remove_path, playlist_folder)
+    return stream_file(zip_path, f'{playlist_name}.zip', cleanup_path=archive_dir)
+
+
+async def prepare_playlist_folder(download_to_device, playlist_name):
+    """Create the temp or server folder a playlist downloads into."""
+    if download_to_device:
+        return await run_io(tempfile.mkdtemp)
+
+    playlist_folder = os.path.join(core.DOWNLOAD_FOLDER, playlist_name)
+    await run_io(functools.partial(os.makedirs, playlist_folder, exist_ok=True))
+    return playlist_folder
+
+
+@app.template_global()
+def asset_url(filename):
+    """URL of a static asset that changes whenever its content does."""
+    return url_for('static', **assets.static_url_args(filename, app.static_folder))
+
+
+async def serve_static(filename):
+    """Serve static files, caching fingerprinted assets for good.
+
+    Built assets are sent as their precompressed variant when the client
+    accepts it.
+    """
+    variant = assets.precompressed_variant(filename, request.headers.get('Accept-Encoding'), app.static_folder)
+    if variant:
+        variant_name, encoding = variant
+        response = await send_from_directory(
+            app.static_folder, variant_name, mimetype=mimetypes.guess_type(filename)[0]
+        )
+        response.content_encoding = encoding
+    else:
+        response = await send_from_directory(app.static_folder, filename)
+
+    if assets.is_fingerprinted(filename, request.args.get('v'), app.static_folder):
+        response.headers['Cache-Control'] = assets.IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+app.view_functions['static'] = serve_static
+
+
+async def conditional_response(response, private=False):
+    """Tag a response with a content ETag and answer 304 when the client's copy matches."""
+    await response.add_etag()
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+    return await response.make_conditional(request)
+
+
+@app.route('/')
+async def index():
+    """Serve main page"""
+    return await conditional_response(await make_response(await render_template('index.html')))
+
+
+@app.route('/api/config', methods=['GET'])
+async def get_config():
+    """Get app configuration"""
+    return await conditional_response(jsonify({
+        'allow_server_storage': core.ALLOW_SERVER_STORAGE,
+        'job_queue': core.USE_JOB_QUEUE
+    }))
+
+
+@app.route('/api/download', methods=['POST'])
+async def download_playlist():
+    """Start download process"""
+    global download_progress
+
+    try:
+        core.require_in_process_downloads()
+        data = await request.get_json(silent=True) or {}
+        tracks_info, playlist_name = core.parse_playlist_download(data)
+        resume = data.get('resume', False)
+        download_to_device = data.get('download_to_device', False)
+        format_type = data.get('format', 'mp3')  # Default to mp3
+
+        playlist_folder = await prepare_playlist_folder(download_to_device, playlist_name)
+
+        # If not resuming, reset progress
+        download_progress, start_index = core.start_progress(download_progress, resume, tracks_info, playlist_name)
+
+        progress = download_progress
+        ip_address = core.get_request_ip(request)
+        lookahead = core.track_lookahead(tracks_info, playlist_folder, format_type, not download_to_device)
+
+        try:
+            for idx in range(start_index, len(tracks_info)):
+                track = tracks_info[idx]
+                if not core.advance_progress(progress, idx, f"{track['artist']} - {track['name']}"):
+                    return jsonify(core.paused_payload(progress))
+
+                lookahead.schedule(idx)
+
+                await run_download(
+                    core.download_track, progress, track, playlist_folder, playlist_name, format_type, ip_address,
+                    not download_to_device, lambda idx=idx: lookahead.result(idx)
+                )
+                await run_io(core.report_unresolved_tracks, progress, lookahead, idx + 1, playlist_name, ip_address)
+
+                # Small delay to avoid rate limits
+                await asyncio.sleep(1)
+        finally:
+            lookahead.close()
+
+        progress['status'] = 'completed'
+        await run_io(core.log_playlist_finished, 'playlist', playlist_name, ip_address)
+
+        if download_to_device:
+            return await send_playlist_archive(playlist_folder, playlist_name, format_type)
+
+        return jsonify(core.finished_payload(progress, 'tracks'))
+
+    except core.RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        download_progress['status'] = 'error'
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/progress', methods=['GET'])
+async def get_progress():
+    """Get download progress"""
+    return jsonify(download_progress)
+
+
+@app.route('/api/stop', methods=['POST'])
+async def stop_download():
+    """Stop the current download"""
+    download_progress['should_stop'] = True
+    return jsonify({'success': True, 'message': 'Download will stop after current track'})
+
+
+@app.route('/api/resume', methods=['POST'])
+async def resume_download():
+    """Resume a paused download"""
+    if download_progress['status'] != 'paused':
+        return jsonify({'error': 'No paused download to resume'}), 400
+
+    # Call download with resume flag
+    return await download_playlist()
+
+
+@app.route('/api/youtube/download', methods=['POST'])
+async def download_youtube_direct():
+    """Download a single YouTube video directly to downloads folder or send to client"""
+    youtube_url = None
+    ip_address = core.get_request_ip(request)
+
+    try:
+        core.require_in_process_downloads()
+        data = await request.get_json()
+        youtube_url = core.parse_youtube_url(data)
+        download_to_device = data.get('download_to_device', False)
+        format_type = data.get('format', 'mp3')  # Default to mp3
+
+        info = await run_download(fetch_video_info, youtube_url)
+        video_title = sanitize_filename(info.get('title', 'video'))
+
+        if download_to_device:
+            temp_dir = await run_io(tempfile.mkdtemp)
+            filepath = os.path.join(temp_dir, video_title)
+        else:
+            filepath = os.path.join(core.DOWNLOAD_FOLDER, video_title)
+
+        output_path = await run_download(download_shared, youtube_url, info.get('id'), filepath, format_type)
+        await run_io(core.log_video_download, video_title, youtube_url, ip_address)
+
+        filename = f'{video_title}{os.path.splitext(output_path)[1]}'
+        if download_to_device:
+            return stream_file(output_path, filename, cleanup_path=temp_dir)
+
+        return jsonify({
+            'success': True,
+            'message': f'Successfully downloaded: {video_title}',
+            'filename': filename
+        })
+
+    except core.RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        await run_io(db.log_download, "youtube", "unknown", youtube_url, False, str(e), ip_address)
+        return jsonify({'error': f'Download failed: {str(e)}'}), 500
+
+
+@app.route('/downloads/<path:filename>')
+async def download_file(filename):
+    """Serve downloaded files"""
+    return await send_from_directory(core.DOWNLOAD_FOLDER, filename, as_attachment=True)
+
+
+@app.route('/api/youtube/playlist/info', methods=['POST'])
+async def get_youtube_playlist_info():
+    """Get YouTube playlist metadata"""
+    try:
+        playlist_url = core.parse_playlist_url(await request.get_json())
+        playlist_info = await run_download(fetch_playlist_info, playlist_url)
+
+        if not playlist_info:
+            return jsonify({'error': 'Failed to fetch playlist information'}), 500
+
+        await run_io(
+            db.log_activity,
+            'youtube_playlist_lookup',
+            f"Fetched playlist info: {playlist_info.get('title', 'Unknown Playlist')}",
+            core.get_request_ip(request)
+        )
+
+        return jsonify(core.playlist_info_payload(playlist_info))
+
+    except core.RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/youtube/playlist/download', methods=['POST'])
+async def download_youtube_playlist():
+    """Download entire YouTube playlist"""
+    global download_progress
+
+    try:
+        core.require_in_process_downloads()
+        data = await request.get_json()
+        playlist_url = core.parse_playlist_url(data)
+        resume = data.get('resume', False)
+        download_to_device = data.get('download_to_device', False)
+        format_type = data.get('format', 'mp3')
+
+        playlist_info = await run_download(fetch_playlist_info, playlist_url)
+        playlist_name = sanitize_filename(playlist_info.get('title', 'youtube_playlist'))
+        playlist_folder = await prepare_playlist_folder(download_to_device, playlist_name)
+        videos_info = core.playlist_videos(playlist_info)
+
+        # If not resuming, reset progress
+        download_progress, start_index = core.start_progress(
+            download_progress, resume, videos_info, playlist_name, playlist_url
+        )
+
+        progress = download_progress
+        ip_address = core.get_request_ip(request)
+
+        for idx in range(start_index, len(videos_info)):
+            video = videos_info[idx]
+            if not core.advance_progress(progress, idx, video['title']):
+                return jsonify(core.paused_payload(progress))
+
+            await run_download(
+                core.download_playlist_video, progress, video, playlist_folder, playlist_url, format_type, ip_address,
+                not download_to_device
+            )
+
+            # Small delay to avoid rate limits
+            await asyncio.sleep(1)
+
+        progress['status'] = 'completed'
+        await run_io(core.log_playlist_finished, 'youtube_playlist', playlist_name, ip_address)
+
+        if download_to_device:
+            return await send_playlist_archive(playlist_folder, playlist_name, format_type)
+
+        return jsonify(core.finished_payload(progress, 'videos'))
+
+    except core.RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        download_progress['status'] = 'error'
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs', methods=['POST'])
+async def create_job():
+    """Queue an imported or YouTube playlist, or a single video, for the worker pool"""
+    try:
+        data = await request.get_json(silent=True) or {}
+        youtube_url = core.parse_youtube_url(data) if data.get('youtube_url') else None
+        video_info = await run_download(fetch_video_info, youtube_url) if youtube_url else None
+        playlist_url = core.parse_playlist_url(data, required=False)
+        playlist_info = await run_download(fetch_playlist_info, playlist_url) if playlist_url else None
+        source_type, playlist_name, items = core.job_items(data, playlist_info, video_info)
+        format_type = data.get('format', 'mp3')
+        await run_io(core.mark_items_in_library, playlist_name, format_type, items)
+
+        ip_address = core.get_request_ip(request)
+        job_id = await run_io(
+            db.create_job, source_type, playlist_name, format_type, items, playlist_url or youtube_url, ip_address
+        )
+        await run_io(core.log_job_created, playlist_name, items, ip_address)
+
+        return jsonify({'success': True, 'job_id': job_id, 'total': len(items)}), 202
+
+    except core.RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+async def get_job(job_id):
+    """Get queued job progress and finished artifacts"""
+    job = await run_io(db.get_job, job_id)
+
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify(core.job_payload(job, url_for))
+
+
+@app.route('/api/jobs/<int:job_id>/archive', methods=['GET'])
+async def get_job_archive(job_id):
+    """Download the finished files of a job as one ZIP"""
+    try:
+        job = await run_io(db.get_job, job_id)
+        files = core.job_archive_files(job)
+    except core.RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+
+    archive_dir = await run_io(tempfile.mkdtemp)
+    archive_name = core.job_archive_name(job)
+    zip_path = await run_io(zip_files, files, os.path.join(archive_dir, archive_name))
+    return stream_file(zip_path, archive_name, cleanup_path=archive_dir)
+
+
+@app.route('/api/tasks/<int:task_id>/artifact', methods=['PUT'])
+async def upload_artifact(task_id):
+    """Receive the file a worker produced for a task it holds the lease on"""
+    try:
+        upload = await run_io(
+            core.begin_artifact_upload, task_id, request.headers.get('X-Lease-Token'), request.args.get('name')
+        )
+    except core.RequestError as e:
+        return jsonify({'error': str(e)}), e.status
+
+    try:
+        handle = await run_io(open, upload['temp_path'], 'wb')
+        try:
+            async for chunk in request.body:
+                await run_io(handle.write, chunk)
+        finally:
+            await run_io(handle.close)
+        artifact_path = await run_io(core.finish_artifact_upload, upload, request.args.get('video_id'))
+        return jsonify({'success': True, 'artifact_path': artifact_path})
+    except Exception as e:
+        await run_io(core.discard_artifact_upload, upload)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/admin')
+@require_admin_password
+async def admin_page():
+    """Serve admin dashboard"""
+    return await conditional_response(await make_response(await render_template('admin.html')), private=True)
+
+
+# Admin API endpoints
+@app.route('/api/admin/stats', methods=['GET'])
+@require_admin_password
+async def get_admin_stats():
+    """Get overall system statistics"""
+    return jsonify(await run_io(db.get_stats))
+
+
+@app.route('/api/admin/activity', methods=['GET'])
+@require_admin_password
+async def get_admin_activity():
+    """Get recent activity"""
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify({'activities': await run_io(db.get_recent_activity, limit)})
+
+
+@app.route('/api/admin/downloads', methods=['GET'])
+@require_admin_password
+async def get_admin_downloads():
+    """Get download history"""
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify({'downloads': await run_io(db.get_download_history, limit)})
+
+
+@app.before_serving
+async def initialize():
+    """Create the downloads folder and database schema before taking traffic."""
+    await run_io(core.create_app)
+
+
+@app.after_serving
+async def shutdown_download_pool():
+    """Drop queued downloads when the server stops."""
+    download_executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == '__main__':
+    port = int(os.getenv('FLASK_PORT', 5000))
+    app.run(debug=True, host='0.0.0.0', port=port)
@@ -0,0 +1,186 @@
+"""Fingerprinted, precompressed static assets.
+
+``python assets.py`` copies every CSS/JS file in ``static/`` to
+``static/dist/<name>.<hash><ext>`` along with ``.gz`` and (when the optional
+``brotli`` package is installed) ``.br`` variants, and writes
+``static/dist/manifest.json`` mapping source names to the hashed copies.
+Templates link assets through ``asset_url``, so a hashed URL can be cached
+forever: any content change produces a new URL. Without a build, URLs fall
+back to ``style.css?v=<hash>``, which busts caches just as well but cannot
+be served precompressed.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+BUILD_EXTENSIONS = ('.css', '.js')
+HASH_LENGTH = 12
+
+# Fingerprinted URLs never change content, so clients may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Preferred first when the client accepts both
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest_cache = {}
+_hash_cache = {}
+
+
+def content_hash(path):
+    """Short SHA-256 of a file's contents."""
+    with open(path, 'rb') as handle:
+        return hashlib.sha256(handle.read()).hexdigest()[:HASH_LENGTH]
+
+
+def compress_variants(path):
+    """Write gzip and, if available, brotli copies next to path."""
+    with open(path, 'rb') as handle:
+        data = handle.read()
+
+    # mtime=0 keeps the gzip output byte-identical across builds
+    with open(f'{path}.gz', 'wb') as handle:
+        handle.write(gzip.compress(data, compresslevel=9, mtime=0))
+
+    try:
+        import brotli
+    except ImportError:
+        return
+    with open(f'{path}.br', 'wb') as handle:
+        handle.write(brotli.compress(data, quality=11))
+
+
+def build(static_folder=STATIC_FOLDER):
+    """Rebuild static/dist and its manifest; returns the manifest."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    os.makedirs(dist)
+
+    manifest = {}
+    for name in sorted(os.listdir(static_folder)):
+        source = os.path.join(static_folder, name)
+        stem, extension = os.path.splitext(name)
+        if not os.path.isfile(source) or extension not in BUILD_EXTENSIONS:
+            continue
+
+        hashed_name = f'{stem}.{content_hash(source)}{extension}'
+        shutil.copyfile(source, os.path.join(dist, hashed_name))
+        compress_variants(os.path.join(dist, hashed_name))
+        manifest[name] = f'{DIST_DIR}/{hashed_name}'
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+
+    _manifest_cache.clear()
+    return manifest
+
+
+def load_manifest(static_folder=STATIC_FOLDER):
+    """Return the build manifest, or {} when no build exists.
+
+    Re-read only when the manifest file changes, so a rebuild is picked up
+    without restarting the server.
+    """
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return {}
+
+    cached = _manifest_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path) as handle:
+        manifest = json.load(handle)
+    _manifest_cache[path] = (mtime, manifest)
+    return manifest
+
+
+def source_hash(static_folder, filename):
+    """Content hash of a source asset, cached until the file changes."""
+    path = os.path.join(static_folder, filename)
+    mtime = os.stat(path).st_mtime
+    cached = _hash_cache.get(path)
+    if not cached or cached[0] != mtime:
+        cached = _hash_cache[path] = (mtime, content_hash(path))
+    return cached[1]
+
+
+def static_url_args(filename, static_folder=STATIC_FOLDER):
+    """Keyword arguments for ``url_for('static', ...)`` pointing at a fingerprinted asset.
+
+    A built copy is used only while its hash still matches the source, so an
+    edit made after the last build falls back to ``?v=`` instead of serving
+    the stale copy.
+    """
+    version = source_hash(static_folder, filename)
+    built = load_manifest(static_folder).get(filename)
+    if built and os.path.splitext(built)[0].endswith(f'.{version}'):
+        return {'filename': built}
+    return {'filename': filename, 'v': version}
+
+
+def is_fingerprinted(filename, version=None, static_folder=STATIC_FOLDER):
+    """Whether a static request names immutable content and may be cached long-term.
+
+    True for built files listed in the manifest, and for ``?v=`` URLs whose
+    version still matches the file on disk.
+    """
+    if filename in load_manifest(static_folder).values():
+        return True
+    if not version:
+        return False
+    try:
+        return version == source_hash(static_folder, filename)
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+
+
+def accepted_encodings(accept_encoding):
+    """Parse an Accept-Encoding header into the set of codings with q > 0."""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def precompressed_variant(filename, accept_encoding, static_folder=STATIC_FOLDER):
+    """Return (variant filename, content coding) for a built asset, or None."""
+    if filename not in load_manifest(static_folder).values():
+        return None
+
+    accepted = accepted_encodings(accept_encoding)
+    for coding, suffix in ENCODINGS:
+        if (coding in accepted or '*' in accepted) and os.path.isfile(os.path.join(static_folder, filename + suffix)):
+            return filename + suffix, coding
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build fingerprinted, precompressed static assets.')
+    parser.add_argument('--static-folder', default=STATIC_FOLDER)
+    args = parser.parse_args()
+
+    for name, built in build(args.static_folder).items():
+        variants = [suffix for _, suffix in ENCODINGS
+                    if os.path.exists(os.path.join(args.static_folder, built + suffix))]
+        print(f"{name} -> {built} ({', '.join(variants) or 'uncompressed only'})")
+
+
+if __name__ == '__main__':
+    main()
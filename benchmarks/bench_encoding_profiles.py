@@ -0,0 +1,69 @@
+"""Compare CPU cost per track across encoding profiles.
+
+Downloads each source once per profile through ``download_media`` and
+reports CPU seconds per track (this process plus the ffmpeg children), so the
+stream-copy profiles (m4a, opus, original) can be compared with full MP3
+re-encodes. Searches are resolved to a video and its metadata is probed up
+front, so neither search nor extraction is part of any profile's time.
+
+    python benchmarks/bench_encoding_profiles.py "https://youtu.be/<id>" "ytsearch1:artist title"
+"""
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from downloader import ENCODING_PROFILES, download_media, fetch_video_info, info_cache, resolve_video
+
+
+def cpu_seconds():
+    """CPU time used so far by this process and its reaped children."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sources', nargs='+', help='YouTube URLs or ytsearch1: queries')
+    parser.add_argument('--profiles', nargs='+', default=[name for name in ENCODING_PROFILES if name != 'mp4'])
+    args = parser.parse_args()
+
+    # Keep probes cached for the whole run so only download + encode is timed
+    info_cache.ttl = float('inf')
+    videos = []
+    for source in args.sources:
+        video_url, video_id = resolve_video(source)
+        if not video_url:
+            sys.exit(f"no video found for {source}")
+        fetch_video_info(video_url, video_id)
+        videos.append((source, video_url, video_id))
+
+    print(f"{'profile':>10} {'cpu s/track':>12} {'wall s/track':>13} {'MB/track':>9}")
+    for profile in args.profiles:
+        folder = tempfile.mkdtemp()
+        cpu_started = cpu_seconds()
+        wall_started = time.perf_counter()
+
+        for index, (source, video_url, video_id) in enumerate(videos):
+            try:
+                download_media(video_url, os.path.join(folder, str(index)), profile, video_id)
+            except Exception as e:
+                print(f"{profile}: download failed for {source}: {e}", file=sys.stderr)
+
+        tracks = len(args.sources)
+        cpu = (cpu_seconds() - cpu_started) / tracks
+        wall = (time.perf_counter() - wall_started) / tracks
+        size = sum(entry.stat().st_size for entry in os.scandir(folder)) / tracks / 1e6
+        print(f"{profile:>10} {cpu:>12.2f} {wall:>13.2f} {size:>9.2f}")
+
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
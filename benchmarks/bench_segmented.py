@@ -0,0 +1,109 @@
+"""Compare single-stream and segmented downloads against a local range server.
+
+Starts a throwaway HTTP server that serves a generated file, honours Range
+requests and throttles every connection, mimicking a CDN that caps per-stream
+throughput. Each configuration downloads the file with
+``segmented.fetch_ranged`` and the checksum is verified.
+
+    python benchmarks/bench_segmented.py --size-mb 32 --per-connection-mbps 40 --connections 1 2 4 8
+    python benchmarks/bench_segmented.py --connections 8 --budget-mbps 60
+"""
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segmented import BandwidthBudget, fetch_ranged
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves server.payload with Range support at server.per_connection bytes/s."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        payload = self.server.payload
+        start, end = 0, len(payload) - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or end), end)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(payload)}')
+        else:
+            self.send_response(200)
+
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+
+        # Throttle this connection only, in 64 KiB slices
+        throttle = BandwidthBudget(self.server.per_connection)
+        view = memoryview(payload)[start:end + 1]
+        for offset in range(0, len(view), 64 * 1024):
+            piece = view[offset:offset + 64 * 1024]
+            throttle.consume(len(piece))
+            self.wfile.write(piece)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=float, default=32)
+    parser.add_argument('--per-connection-mbps', type=float, default=40, help='Server cap per connection (Mbit/s)')
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--chunk-mb', type=float, default=4)
+    parser.add_argument('--budget-mbps', type=float, default=0, help='Per-job bandwidth budget (Mbit/s, 0 = none)')
+    args = parser.parse_args()
+
+    payload = os.urandom(int(args.size_mb * 1024 * 1024))
+    expected = hashlib.sha256(payload).hexdigest()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    server.daemon_threads = True
+    server.payload = payload
+    server.per_connection = args.per_connection_mbps * 1e6 / 8
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/video.mp4'
+
+    scratch = tempfile.mkdtemp()
+    print(f"{'connections':>11} {'seconds':>8} {'Mbit/s':>8} {'speedup':>8}")
+    baseline = None
+    try:
+        for connections in args.connections:
+            dest = os.path.join(scratch, f'video-{connections}.mp4')
+            started = time.perf_counter()
+            fetch_ranged(
+                url,
+                dest,
+                connections=connections,
+                chunk_size=int(args.chunk_mb * 1024 * 1024),
+                budget=BandwidthBudget(args.budget_mbps * 1e6 / 8),
+            )
+            elapsed = time.perf_counter() - started
+
+            with open(dest, 'rb') as handle:
+                if hashlib.sha256(handle.read()).hexdigest() != expected:
+                    sys.exit(f"checksum mismatch with {connections} connections")
+
+            mbps = len(payload) * 8 / elapsed / 1e6
+            baseline = baseline or mbps
+            print(f"{connections:>11} {elapsed:>8.2f} {mbps:>8.1f} {mbps / baseline:>7.2f}x")
+    finally:
+        server.shutdown()
+        shutil.rmtree(scratch)
+
+
+if __name__ == '__main__':
+    main()
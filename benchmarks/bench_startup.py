@@ -0,0 +1,94 @@
+"""Track cold-start import cost of the web app.
+
+Imports a module (``app`` by default) in fresh interpreters with
+``python -X importtime`` and reports the total import time together with the
+slowest top-level imports. It also checks that importing stays free of the
+side effects moved behind ``create_app()``: ``yt_dlp`` must not load and no
+database file may be created. Pass ``--budget-ms`` to fail when the median
+total exceeds a budget, so the improvement stays locked in.
+
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 400
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only load on first use
+DEFERRED_MODULES = ('yt_dlp', 'youtubesearchpython')
+
+
+def measure(module):
+    """Import module once in a clean interpreter.
+
+    Returns (total us, top-level (cumulative us, name) rows, every imported
+    module name, scratch working directory).
+    """
+    scratch = tempfile.mkdtemp()
+    env = dict(os.environ, PYTHONPATH=ROOT, DATABASE_PATH=os.path.join(scratch, 'app.db'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=scratch,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+
+    total_us = sum(self_us for self_us, _, _ in rows)
+    # Top-level imports are the ones importtime prints without indentation
+    top_level = [(cumulative_us, name.strip()) for _, cumulative_us, name in rows if not name.startswith('  ')]
+    return total_us, top_level, [name.strip() for _, _, name in rows], scratch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, help='Fail if the median total import time exceeds this')
+    args = parser.parse_args()
+
+    totals = []
+    for run in range(args.runs):
+        total_us, top_level, imported, scratch = measure(args.module)
+        totals.append(total_us / 1000)
+        if run < args.runs - 1:
+            shutil.rmtree(scratch)
+
+    print(f"import {args.module}: median {statistics.median(totals):.1f} ms, "
+          f"min {min(totals):.1f} ms over {args.runs} runs")
+    print("\nSlowest top-level imports (last run):")
+    for cumulative_us, name in sorted(top_level, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>9.1f} ms  {name}")
+
+    failures = []
+    loaded = sorted({name.split('.')[0] for name in imported} & set(DEFERRED_MODULES))
+    if loaded:
+        failures.append(f"deferred modules imported at startup: {', '.join(loaded)}")
+    if os.listdir(scratch):
+        failures.append(f"import created files: {', '.join(os.listdir(scratch))}")
+    if args.budget_ms is not None and statistics.median(totals) > args.budget_ms:
+        failures.append(f"median {statistics.median(totals):.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+
+    shutil.rmtree(scratch)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
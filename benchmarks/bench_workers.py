@@ -0,0 +1,86 @@
+"""Measure job-queue throughput as the number of worker processes grows.
+
+Runs entirely locally: a temporary SQLite job store (or the Postgres database
+given by ``--database-url``, whose queue tables are emptied each round), N
+``worker.run_worker`` processes, and a stand-in download that sleeps for a
+fixed time instead of calling yt-dlp. With downloads dominating task time, N
+workers should finish the queue roughly N times faster than one.
+
+    python benchmarks/bench_workers.py --tasks 40 --workers 1 2 4 --task-seconds 0.25
+    python benchmarks/bench_workers.py --database-url postgresql://localhost/bench
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def fake_download(task):
+    """Stand-in for yt-dlp: hold the lease for a fixed time and report an artifact."""
+    time.sleep(float(os.environ['BENCH_TASK_SECONDS']))
+    return f"{task['playlist_name']}/{task['title']}.mp3"
+
+
+def worker_process(worker_id):
+    import worker
+    worker.run_worker(worker_id=worker_id, download_func=fake_download, poll_interval=0.05, exit_when_idle=True)
+
+
+def run_round(workers, tasks, database_url=None):
+    import database as db
+
+    if database_url:
+        db.DATABASE_URL = os.environ['DATABASE_URL'] = database_url
+        db.init_db()
+        conn = db.get_db()
+        conn.cursor().execute('DELETE FROM job_tasks')
+        conn.cursor().execute('DELETE FROM jobs')
+        conn.commit()
+        conn.close()
+    else:
+        db.DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        os.environ['DATABASE_PATH'] = db.DATABASE_PATH
+        db.init_db()
+    job_id = db.create_job('playlist', 'bench', 'mp3', [{'title': f'track-{i}'} for i in range(tasks)])
+
+    started = time.perf_counter()
+    processes = [
+        multiprocessing.Process(target=worker_process, args=(f'bench-{i}',))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    job = db.get_job(job_id)
+    assert job['completed'] == tasks, f"only {job['completed']} of {tasks} tasks completed"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=40)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--task-seconds', type=float, default=0.25)
+    parser.add_argument('--database-url', help='Benchmark a Postgres queue instead of a temporary SQLite file')
+    args = parser.parse_args()
+
+    os.environ['BENCH_TASK_SECONDS'] = str(args.task_seconds)
+
+    baseline = None
+    print(f"{'workers':>8} {'seconds':>9} {'tasks/s':>9} {'speedup':>8}")
+    for workers in args.workers:
+        elapsed = run_round(workers, args.tasks, args.database_url)
+        throughput = args.tasks / elapsed
+        baseline = baseline or throughput
+        print(f"{workers:>8} {elapsed:>9.2f} {throughput:>9.2f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
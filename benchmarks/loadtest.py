@@ -0,0 +1,314 @@
+"""Load-test the HTTP API with many concurrent users, fully offline.
+
+Starts ``loadtest_server.py`` (the real app with ``yt_dlp.YoutubeDL`` stubbed out) against
+a throwaway database and download folder under one or more server
+configurations. Simulated users hit ``/api/download``, ``/api/progress``,
+``/api/admin/stats`` and ``/downloads/<file>`` in a weighted mix. For each
+configuration the script reports per-endpoint throughput, latency
+percentiles and error rates, plus time spent in SQLite and lock errors per
+endpoint, as recorded inside every server process.
+
+    python benchmarks/loadtest.py --users 200 --duration 30
+    python benchmarks/loadtest.py --servers flask gunicorn-threads gunicorn-processes hypercorn
+
+The client is a thread per user, so at very high request rates the client
+itself can become the bottleneck; compare configurations at the same
+settings rather than reading absolute numbers.
+"""
+import argparse
+import base64
+import glob
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+ADMIN_USERNAME = 'loadtest'
+ADMIN_PASSWORD = 'loadtest'
+FIXTURE_URL = '/downloads/loadtest/fixture.mp3'
+
+# Server configurations; each returns the command line for a port and the parsed args
+SERVERS = {
+    'flask': lambda port, args: [
+        sys.executable, 'loadtest_server.py', '--port', str(port),
+    ],
+    'gunicorn-threads': lambda port, args: [
+        sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+        '--worker-class', 'gthread', '--workers', '1', '--threads', str(args.threads),
+        'loadtest_server:create_app()',
+    ],
+    'gunicorn-processes': lambda port, args: [
+        sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+        '--workers', str(args.processes), 'loadtest_server:create_app()',
+    ],
+    'hypercorn': lambda port, args: [
+        sys.executable, '-m', 'hypercorn', '--bind', f'127.0.0.1:{port}',
+        'loadtest_server:create_asgi_app()',
+    ],
+}
+
+DEFAULT_MIX = {'progress': 40, 'file': 30, 'stats': 20, 'download': 10}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, args, scratch):
+    """Launch one server configuration and wait until it answers."""
+    port = free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([ROOT, HERE]),
+        DATABASE_PATH=os.path.join(scratch, 'app.db'),
+        DOWNLOAD_FOLDER=os.path.join(scratch, 'downloads'),
+        DATABASE_TIMEOUT=str(args.db_timeout),
+        ADMIN_USERNAME=ADMIN_USERNAME,
+        ADMIN_PASSWORD=ADMIN_PASSWORD,
+        LOADTEST_STATS_DIR=os.path.join(scratch, 'stats'),
+        LOADTEST_RESOLVE_SECONDS=str(args.resolve_seconds),
+        LOADTEST_DOWNLOAD_SECONDS=str(args.download_seconds),
+        LOADTEST_CATALOGUE_SIZE=str(args.catalogue_size),
+    )
+    os.makedirs(env['LOADTEST_STATS_DIR'])
+    log = open(os.path.join(scratch, 'server.log'), 'wb')
+    process = subprocess.Popen(SERVERS[name](port, args), cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            with urllib.request.urlopen(f'{base_url}/api/config', timeout=1):
+                return process, base_url
+        except OSError:
+            time.sleep(0.2)
+
+    process.kill()
+    log.close()
+    with open(log.name) as handle:
+        sys.exit(f"{name} server did not start:\n{handle.read()}")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def build_request(endpoint, base_url, user, sequence, args):
+    """Return a urllib Request for one scenario step."""
+    if endpoint == 'download':
+        body = json.dumps({
+            # Unique names so every request really downloads instead of hitting the library
+            'tracks': [{'name': f'user{user}-{sequence}-{i}', 'artist': 'loadtest'} for i in range(args.tracks)],
+            'playlist_name': f'loadtest-{user % 10}',
+            'format': 'mp3',
+        }).encode()
+        return urllib.request.Request(
+            f'{base_url}/api/download', data=body, headers={'Content-Type': 'application/json'}, method='POST'
+        )
+    if endpoint == 'progress':
+        return urllib.request.Request(f'{base_url}/api/progress')
+    if endpoint == 'stats':
+        token = base64.b64encode(f'{ADMIN_USERNAME}:{ADMIN_PASSWORD}'.encode()).decode()
+        return urllib.request.Request(f'{base_url}/api/admin/stats', headers={'Authorization': f'Basic {token}'})
+    return urllib.request.Request(f'{base_url}{FIXTURE_URL}')
+
+
+def run_user(user, base_url, mix, args, stop_at, results):
+    """One simulated user: weighted random requests until stop_at."""
+    rng = random.Random(args.seed + user)
+    endpoints, weights = zip(*mix.items())
+    records = results[user] = []
+    sequence = 0
+
+    # Spread start-up over the ramp so connections don't all open at once
+    time.sleep(args.ramp_up * user / args.users)
+
+    while time.monotonic() < stop_at:
+        endpoint = rng.choices(endpoints, weights)[0]
+        request = build_request(endpoint, base_url, user, sequence, args)
+        sequence += 1
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=args.timeout) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+        except (OSError, http.client.HTTPException):
+            status = 'conn'
+        records.append((endpoint, status, time.perf_counter() - started))
+
+        if args.think_ms:
+            time.sleep(rng.uniform(0, 2 * args.think_ms) / 1000)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def collect_db_stats(stats_dir):
+    """Merge the per-process SQLite counters written by loadtest_server.
+
+    Returns {(URL rule, function): counters}.
+    """
+    merged = {}
+    for path in glob.glob(os.path.join(stats_dir, '*.json')):
+        with open(path) as handle:
+            for rule, functions in json.load(handle).items():
+                for name, entry in functions.items():
+                    total = merged.setdefault((rule, name), {'calls': 0, 'seconds': 0.0, 'max': 0.0, 'slow': 0, 'locked': 0})
+                    for key in ('calls', 'seconds', 'slow', 'locked'):
+                        total[key] += entry[key]
+                    total['max'] = max(total['max'], entry['max'])
+    return merged
+
+
+def run_scenario(name, args, mix):
+    scratch = tempfile.mkdtemp(prefix=f'loadtest-{name}-')
+    process, base_url = start_server(name, args, scratch)
+    results = {}
+
+    try:
+        stop_at = time.monotonic() + args.ramp_up + args.duration
+        users = [
+            threading.Thread(target=run_user, args=(user, base_url, mix, args, stop_at, results), daemon=True)
+            for user in range(args.users)
+        ]
+        started = time.perf_counter()
+        for thread in users:
+            thread.start()
+        for thread in users:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        # Let every server process flush its final counters
+        time.sleep(1)
+        db_stats = collect_db_stats(os.path.join(scratch, 'stats'))
+    finally:
+        stop_server(process)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    by_endpoint = defaultdict(list)
+    for records in results.values():
+        for endpoint, status, latency in records:
+            by_endpoint[endpoint].append((status, latency))
+
+    return elapsed, by_endpoint, db_stats
+
+
+def report(name, elapsed, by_endpoint, db_stats):
+    print(f"\n== {name} ({elapsed:.1f} s) ==")
+    print(f"{'endpoint':>10} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'errors':>8}")
+
+    summary = {'requests': 0, 'errors': 0, 'latencies': []}
+    statuses = Counter()
+    for endpoint in sorted(by_endpoint):
+        samples = by_endpoint[endpoint]
+        latencies = sorted(latency for _, latency in samples)
+        errors = sum(1 for status, _ in samples if status == 'conn' or status >= 400)
+        statuses.update(f'{endpoint}:{status}' for status, _ in samples if status == 'conn' or status >= 400)
+        print(f"{endpoint:>10} {len(samples):>9} {len(samples) / elapsed:>8.1f} "
+              f"{percentile(latencies, 0.50) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} "
+              f"{percentile(latencies, 0.99) * 1000:>8.1f} {latencies[-1] * 1000:>8.1f} "
+              f"{errors / len(samples):>7.1%}")
+        summary['requests'] += len(samples)
+        summary['errors'] += errors
+        summary['latencies'] += latencies
+
+    if statuses:
+        print("errors by status: " + ', '.join(f'{key} x{count}' for key, count in statuses.most_common()))
+
+    print(f"\n{'sqlite by endpoint':>28} {'calls':>8} {'total ms':>9} {'>100ms':>7} {'locked':>7}")
+    by_rule = defaultdict(Counter)
+    for (rule, _), entry in db_stats.items():
+        by_rule[rule].update({key: entry[key] for key in ('calls', 'seconds', 'slow', 'locked')})
+    for rule, totals in sorted(by_rule.items(), key=lambda item: -item[1]['seconds']):
+        print(f"{rule:>28} {totals['calls']:>8} {totals['seconds'] * 1000:>9.1f} "
+              f"{totals['slow']:>7} {totals['locked']:>7}")
+
+    print(f"\n{'endpoint':>28} {'sqlite call':>24} {'calls':>8} {'mean ms':>8} {'max ms':>8} {'>100ms':>7} {'locked':>7}")
+    for (rule, function), entry in sorted(db_stats.items(), key=lambda item: -item[1]['seconds']):
+        print(f"{rule:>28} {function:>24} {entry['calls']:>8} {entry['seconds'] / entry['calls'] * 1000:>8.2f} "
+              f"{entry['max'] * 1000:>8.1f} {entry['slow']:>7} {entry['locked']:>7}")
+
+    summary['latencies'].sort()
+    summary['locked'] = sum(entry['locked'] for entry in db_stats.values())
+    summary['slow'] = sum(entry['slow'] for entry in db_stats.values())
+    return summary
+
+
+def parse_mix(values):
+    mix = dict(DEFAULT_MIX)
+    for value in values or []:
+        endpoint, _, weight = value.partition('=')
+        if endpoint not in DEFAULT_MIX or not weight.isdigit():
+            sys.exit(f"bad --mix entry {value!r}; use e.g. download=10 (endpoints: {', '.join(DEFAULT_MIX)})")
+        mix[endpoint] = int(weight)
+    return {endpoint: weight for endpoint, weight in mix.items() if weight}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servers', nargs='+', choices=sorted(SERVERS), default=['flask'])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of full load per server')
+    parser.add_argument('--ramp-up', type=float, default=2, help='Seconds over which users start')
+    parser.add_argument('--think-ms', type=float, default=100, help='Mean pause between a user\'s requests')
+    parser.add_argument('--mix', nargs='*', metavar='ENDPOINT=WEIGHT', help='Override request weights')
+    parser.add_argument('--tracks', type=int, default=1, help='Tracks per /api/download request')
+    parser.add_argument('--threads', type=int, default=32, help='gunicorn-threads: threads per worker')
+    parser.add_argument('--processes', type=int, default=4, help='gunicorn-processes: worker processes')
+    parser.add_argument('--resolve-seconds', type=float, default=0.05, help='Stub search latency')
+    parser.add_argument('--download-seconds', type=float, default=0.2, help='Stub download latency')
+    parser.add_argument('--catalogue-size', type=int, default=50,
+                        help='Distinct videos that searches resolve to; smaller means more shared downloads')
+    parser.add_argument('--db-timeout', type=float, default=30, help='DATABASE_TIMEOUT for the server')
+    parser.add_argument('--timeout', type=float, default=60, help='Client timeout per request')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    summaries = {}
+    for name in args.servers:
+        elapsed, by_endpoint, db_stats = run_scenario(name, args, mix)
+        summaries[name] = (elapsed, report(name, elapsed, by_endpoint, db_stats))
+
+    if len(summaries) > 1:
+        print(f"\n{'server':>20} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>8} "
+              f"{'db >100ms':>10} {'locked':>7}")
+        for name, (elapsed, summary) in summaries.items():
+            latencies = summary['latencies']
+            print(f"{name:>20} {summary['requests'] / elapsed:>8.1f} {percentile(latencies, 0.50) * 1000:>8.1f} "
+                  f"{percentile(latencies, 0.95) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} "
+                  f"{summary['errors'] / max(summary['requests'], 1):>7.1%} {summary['slow']:>10} "
+                  f"{summary['locked']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""Offline stand-in server for ``loadtest.py``.
+
+Imports the real app with ``yt_dlp.YoutubeDL`` replaced by a timed stand-in,
+so searches, extraction and downloads go through the real ``downloader`` code
+(``info_cache``, ``build_ydl_opts``, ``download_media`` and the coalescing in
+``download_shared``) and touch the disk, the library index and SQLite exactly
+like real ones, but never the network. Searches map onto a fixed catalogue
+of ``LOADTEST_CATALOGUE_SIZE`` videos, so concurrent users share downloads
+and cached extractions the way popular tracks do. Every public ``database`` function is wrapped to measure the time
+spent in SQLite and count "database is locked" errors, attributed to the URL
+rule of the request that made the call. Threads and executor jobs started
+while handling a request (lookaheads, library scans, ``asgi.py``'s
+``run_download``) inherit its rule; anything else counts as
+``(background)``. Each server process writes its counters to
+``LOADTEST_STATS_DIR/<pid>.json``.
+
+Configured through the environment ``loadtest.py`` sets (``DATABASE_PATH``,
+``DOWNLOAD_FOLDER``, ``ADMIN_PASSWORD``, ``LOADTEST_*``). Entry points::
+
+    python loadtest_server.py --port 5001            # Flask threaded server
+    gunicorn 'loadtest_server:create_app()'           # WSGI
+    hypercorn 'loadtest_server:create_asgi_app()'     # ASGI (asgi.py)
+"""
+import argparse
+import concurrent.futures
+import contextvars
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from functools import wraps
+
+import yt_dlp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as core
+import database as db
+import downloader
+
+RESOLVE_SECONDS = float(os.getenv('LOADTEST_RESOLVE_SECONDS', 0.05))
+DOWNLOAD_SECONDS = float(os.getenv('LOADTEST_DOWNLOAD_SECONDS', 0.2))
+DOWNLOAD_BYTES = int(os.getenv('LOADTEST_DOWNLOAD_BYTES', 64 * 1024))
+FIXTURE_BYTES = int(os.getenv('LOADTEST_FIXTURE_BYTES', 1024 * 1024))
+CATALOGUE_SIZE = int(os.getenv('LOADTEST_CATALOGUE_SIZE', 50))
+STATS_DIR = os.getenv('LOADTEST_STATS_DIR')
+
+# Served by /downloads/<path>, relative to DOWNLOAD_FOLDER
+FIXTURE_PATH = 'loadtest/fixture.mp3'
+
+# A call this slow almost always waited on another connection's lock
+SLOW_QUERY_SECONDS = 0.1
+FLUSH_INTERVAL = 0.5
+
+
+def catalogue_video(query):
+    """Watch-page entry of the catalogue video a search query lands on."""
+    index = int(hashlib.sha1(query.encode()).hexdigest(), 16) % CATALOGUE_SIZE
+    video_id = f'loadtest{index:03d}'
+    return {
+        'id': video_id,
+        'title': f'Load test video {index}',
+        'url': f'https://www.youtube.com/watch?v={video_id}',
+        'webpage_url': f'https://www.youtube.com/watch?v={video_id}',
+    }
+
+
+class FakeYoutubeDL:
+    """Stand-in for ``yt_dlp.YoutubeDL``: fixed delays instead of network and ffmpeg."""
+
+    sanitize_info = staticmethod(yt_dlp.YoutubeDL.sanitize_info)
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def extract_info(self, url, download=False):
+        time.sleep(RESOLVE_SECONDS)
+        if url.startswith('ytsearch'):
+            return {'_type': 'playlist', 'id': url, 'entries': [catalogue_video(url)]}
+
+        video_id = downloader.extract_video_id(url) or hashlib.sha1(url.encode()).hexdigest()[:11]
+        return {
+            'id': video_id,
+            'title': f'Load test video {video_id}',
+            'webpage_url': url,
+            'ext': 'webm',
+            'formats': [{'format_id': '251', 'ext': 'webm', 'acodec': 'opus', 'vcodec': 'none'}],
+        }
+
+    def process_ie_result(self, info, download=True):
+        """Write DOWNLOAD_BYTES where yt-dlp's postprocessors would leave the file."""
+        time.sleep(DOWNLOAD_SECONDS)
+        output_path = self.params['outtmpl'].replace('%(ext)s', info['ext'])
+        for postprocessor in self.params.get('postprocessors', []):
+            output_path = f"{output_path}.{postprocessor['preferredcodec']}"
+        if self.params.get('merge_output_format'):
+            output_path = f"{output_path}.{self.params['merge_output_format']}"
+
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        with open(output_path, 'wb') as handle:
+            handle.write(os.urandom(DOWNLOAD_BYTES))
+        return dict(info, requested_downloads=[{'filepath': output_path}])
+
+
+yt_dlp.YoutubeDL = FakeYoutubeDL
+
+
+# --- SQLite instrumentation -------------------------------------------------
+
+_db_stats = {}
+_db_stats_lock = threading.Lock()
+_flusher_pid = None
+
+# Set per request by tag_endpoint; the patches below carry it into worker threads
+_current_endpoint = contextvars.ContextVar('loadtest_endpoint', default='(background)')
+
+_submit = concurrent.futures.ThreadPoolExecutor.submit
+_start = threading.Thread.start
+
+
+def _submit_in_context(self, fn, /, *args, **kwargs):
+    return _submit(self, contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _start_in_context(self):
+    run, context = self.run, contextvars.copy_context()
+    self.run = lambda: context.run(run)
+    _start(self)
+
+
+concurrent.futures.ThreadPoolExecutor.submit = _submit_in_context
+threading.Thread.start = _start_in_context
+
+
+def _flush_stats_forever():
+    path = os.path.join(STATS_DIR, f'{os.getpid()}.json')
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        with _db_stats_lock:
+            snapshot = json.dumps(_db_stats)
+        with open(f'{path}.tmp', 'w') as handle:
+            handle.write(snapshot)
+        os.replace(f'{path}.tmp', path)
+
+
+def _record(name, elapsed, locked):
+    global _flusher_pid
+
+    with _db_stats_lock:
+        # Started lazily (and again after a fork) so every worker process reports
+        if STATS_DIR and _flusher_pid != os.getpid():
+            _flusher_pid = os.getpid()
+            threading.Thread(target=_flush_stats_forever, daemon=True).start()
+
+        endpoint_stats = _db_stats.setdefault(_current_endpoint.get(), {})
+        entry = endpoint_stats.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max': 0.0, 'slow': 0, 'locked': 0})
+        entry['calls'] += 1
+        entry['seconds'] += elapsed
+        entry['max'] = max(entry['max'], elapsed)
+        entry['slow'] += elapsed >= SLOW_QUERY_SECONDS
+        entry['locked'] += locked
+
+
+def instrument(func):
+    """Time a database function and count lock errors it raises."""
+    @wraps(func)
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        locked = False
+        try:
+            return func(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            locked = 'locked' in str(e)
+            raise
+        finally:
+            _record(func.__name__, time.perf_counter() - started, locked)
+
+    return timed
+
+
+for name, func in list(vars(db).items()):
+    if inspect.isfunction(func) and func.__module__ == db.__name__ and not name.startswith('_') \
+            and name not in ('get_db', 'init_db'):
+        setattr(db, name, instrument(func))
+
+
+def tag_endpoint():
+    """Flask before_request hook: attribute SQLite calls to this request's URL rule."""
+    from flask import request
+
+    _current_endpoint.set(request.url_rule.rule if request.url_rule else request.path)
+
+
+async def tag_endpoint_async():
+    """Quart equivalent; must be async, as Quart runs sync hooks in another thread."""
+    from quart import request
+
+    _current_endpoint.set(request.url_rule.rule if request.url_rule else request.path)
+
+
+def prepare_fixture():
+    """Create the file the /downloads scenario fetches."""
+    path = os.path.join(core.DOWNLOAD_FOLDER, FIXTURE_PATH)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as handle:
+            handle.write(os.urandom(FIXTURE_BYTES))
+
+
+def create_app():
+    """WSGI entry point: the real Flask app running against the stubs."""
+    flask_app = core.create_app()
+    flask_app.before_request(tag_endpoint)
+    prepare_fixture()
+    return flask_app
+
+
+def create_asgi_app():
+    """ASGI entry point: asgi.py running against the stubs (imports Quart only here)."""
+    import asgi
+
+    asgi.app.before_request(tag_endpoint_async)
+    prepare_fixture()
+    return asgi.app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+
+    create_app().run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
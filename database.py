@@ -1,24 +1,138 @@
+import os
 import sqlite3
+import time
+import uuid
 
-DATABASE_PATH = "app.db"
+DATABASE_PATH = os.getenv("DATABASE_PATH", "app.db")
 
+# A postgresql:// URL switches every process to Postgres (needs the optional
+# psycopg package); that is what lets workers on other machines share the
+# job queue. Without it the database is the SQLite file at DATABASE_PATH.
+DATABASE_URL = os.getenv("DATABASE_URL", "")
 
-def get_db():
-    """Get a SQLite connection with row access by column name."""
-    conn = sqlite3.connect(DATABASE_PATH)
+# Seconds a connection waits on another writer before raising "database is locked".
+DATABASE_TIMEOUT = float(os.getenv("DATABASE_TIMEOUT", "30"))
+
+# The SQL that differs between backends. Everything else is written once with
+# SQLite's ``?`` placeholders, which the Postgres cursor rewrites to ``%s``.
+DIALECTS = {
+    "sqlite": {
+        "serial_key": "INTEGER PRIMARY KEY AUTOINCREMENT",
+        "real": "REAL",
+        "day_ago": "datetime('now', '-1 day')",
+        "skip_locked": "",
+    },
+    "postgres": {
+        "serial_key": "BIGSERIAL PRIMARY KEY",
+        # Postgres REAL is single precision, far too coarse for epoch seconds
+        "real": "DOUBLE PRECISION",
+        # Sessions run in UTC (see _connect), like SQLite's CURRENT_TIMESTAMP
+        "day_ago": "LOCALTIMESTAMP - INTERVAL '1 day'",
+        # Racing workers skip a row another one is claiming instead of waiting on it
+        "skip_locked": "FOR UPDATE SKIP LOCKED",
+    },
+}
+
+
+# Databases whose schema has been created by this process
+_initialized_paths = set()
+
+
+def _is_postgres():
+    """Whether DATABASE_URL points this process at Postgres."""
+    return DATABASE_URL.startswith(("postgres://", "postgresql://"))
+
+
+def _dialect():
+    """Backend-specific SQL fragments for the configured database."""
+    return DIALECTS["postgres" if _is_postgres() else "sqlite"]
+
+
+def _database_name():
+    return DATABASE_URL if _is_postgres() else DATABASE_PATH
+
+
+class _PostgresCursor:
+    """psycopg cursor that accepts the ``?`` placeholders used throughout this module."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(self._translate(sql), params)
+
+    def executemany(self, sql, params_seq):
+        self._cursor.executemany(self._translate(sql), params_seq)
+
+    @staticmethod
+    def _translate(sql):
+        return sql.replace("%", "%%").replace("?", "%s")
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _PostgresConnection:
+    """psycopg connection handing out placeholder-translating cursors."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _PostgresCursor(self._conn.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _connect():
+    """Open a connection without checking the schema.
+
+    Rows support access by column name on both backends.
+    """
+    if _is_postgres():
+        import psycopg
+        from psycopg.rows import dict_row
+
+        conn = psycopg.connect(DATABASE_URL, row_factory=dict_row)
+        conn.execute("SET TIME ZONE 'UTC'")
+        conn.commit()
+        return _PostgresConnection(conn)
+
+    conn = sqlite3.connect(DATABASE_PATH, timeout=DATABASE_TIMEOUT)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def _row_with_text_timestamp(row):
+    """Row as a dict, with a Postgres timestamp rendered the way SQLite stores it."""
+    row = dict(row)
+    if not isinstance(row["timestamp"], (str, type(None))):
+        row["timestamp"] = row["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
+    return row
+
+
+def get_db():
+    """Get a database connection with row access by column name.
+
+    Creates the schema on first use if the app factory has not already done
+    so, which keeps importing this module free of disk side effects.
+    """
+    if _database_name() not in _initialized_paths:
+        init_db()
+    return _connect()
+
+
 def init_db():
     """Initialize the minimal tables used by the public app."""
-    conn = get_db()
+    sql = _dialect()
+    conn = _connect()
     cursor = conn.cursor()
 
     cursor.execute(
-        """
+        f"""
         CREATE TABLE IF NOT EXISTS activity_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id {sql['serial_key']},
             action TEXT NOT NULL,
             details TEXT,
             ip_address TEXT,
@@ -28,9 +142,9 @@ def init_db():
     )
 
     cursor.execute(
-        """
+        f"""
         CREATE TABLE IF NOT EXISTS download_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id {sql['serial_key']},
             download_type TEXT NOT NULL,
             item_name TEXT NOT NULL,
             playlist_url TEXT,
@@ -42,8 +156,93 @@ def init_db():
         """
     )
 
+    # Job queue shared by the control plane and any number of workers. Times
+    # are epoch seconds so lease checks stay portable across SQL backends.
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id {sql['serial_key']},
+            source_type TEXT NOT NULL,
+            playlist_name TEXT NOT NULL,
+            source_url TEXT,
+            format TEXT NOT NULL,
+            requester_ip TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            created_at {sql['real']} NOT NULL,
+            finished_at {sql['real']}
+        )
+        """
+    )
+
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS job_tasks (
+            id {sql['serial_key']},
+            job_id INTEGER NOT NULL REFERENCES jobs (id),
+            position INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            artist TEXT,
+            source_url TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_token TEXT,
+            lease_expires_at {sql['real']},
+            artifact_path TEXT,
+            error_message TEXT,
+            updated_at {sql['real']} NOT NULL
+        )
+        """
+    )
+
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_job_tasks_claim ON job_tasks (status, lease_expires_at)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_job_tasks_job ON job_tasks (job_id, position)"
+    )
+
+    # On-disk library index: what already sits in each download folder, so
+    # playlist re-runs can skip files instead of fetching them again.
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS library_files (
+            path TEXT PRIMARY KEY,
+            folder TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            video_id TEXT,
+            format TEXT,
+            size BIGINT NOT NULL,
+            mtime {sql['real']} NOT NULL,
+            checksum TEXT NOT NULL,
+            indexed_at {sql['real']} NOT NULL
+        )
+        """
+    )
+
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_library_files_folder ON library_files (folder)"
+    )
+
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS library_folders (
+            folder TEXT PRIMARY KEY,
+            mtime {sql['real']} NOT NULL,
+            scanned_at {sql['real']} NOT NULL
+        )
+        """
+    )
+
+    # WAL lets the web app read progress while workers write to the queue. It
+    # relies on shared memory, so a SQLite file must stay on a local disk used
+    # by processes on one host (not NFS/SMB); use Postgres across machines.
+    if not _is_postgres():
+        cursor.execute("PRAGMA journal_mode=WAL")
+
     conn.commit()
     conn.close()
+    _initialized_paths.add(_database_name())
 
 
 def log_activity(action, details=None, ip_address=None):
@@ -107,7 +306,7 @@ def get_recent_activity(limit=50):
 
     activities = cursor.fetchall()
     conn.close()
-    return [dict(activity) for activity in activities]
+    return [_row_with_text_timestamp(activity) for activity in activities]
 
 
 def get_download_history(limit=50):
@@ -127,7 +326,7 @@ def get_download_history(limit=50):
 
     downloads = cursor.fetchall()
     conn.close()
-    return [dict(download) for download in downloads]
+    return [_row_with_text_timestamp(download) for download in downloads]
 
 
 def get_stats():
@@ -136,26 +335,28 @@ def get_stats():
     cursor = conn.cursor()
     stats = {}
 
-    cursor.execute("SELECT COUNT(*) AS count FROM download_history WHERE success = 1")
+    day_ago = _dialect()["day_ago"]
+
+    cursor.execute("SELECT COUNT(*) AS count FROM download_history WHERE success = ?", (True,))
     stats["total_downloads"] = cursor.fetchone()["count"]
 
-    cursor.execute("SELECT COUNT(*) AS count FROM download_history WHERE success = 0")
+    cursor.execute("SELECT COUNT(*) AS count FROM download_history WHERE success = ?", (False,))
     stats["failed_downloads"] = cursor.fetchone()["count"]
 
     cursor.execute(
-        """
+        f"""
         SELECT COUNT(*) AS count
         FROM activity_logs
-        WHERE timestamp > datetime('now', '-1 day')
+        WHERE timestamp > {day_ago}
         """
     )
     stats["activity_last_24h"] = cursor.fetchone()["count"]
 
     cursor.execute(
-        """
+        f"""
         SELECT COUNT(*) AS count
         FROM download_history
-        WHERE timestamp > datetime('now', '-1 day')
+        WHERE timestamp > {day_ago}
         """
     )
     stats["downloads_last_24h"] = cursor.fetchone()["count"]
@@ -171,7 +372,7 @@ def get_stats():
             SELECT ip_address
             FROM download_history
             WHERE ip_address IS NOT NULL AND ip_address != ''
-        )
+        ) AS ips
         """
     )
     stats["unique_ips"] = cursor.fetchone()["count"]
@@ -180,4 +381,349 @@ def get_stats():
     return stats
 
 
-init_db()
+def create_job(source_type, playlist_name, format_type, items, source_url=None, requester_ip=None):
+    """Queue a job with one task per track or video and return its id.
+
+    Each item is a dict with ``title`` and optional ``artist`` / ``source_url``.
+    An item with an ``artifact_path`` (already in the library) is stored as
+    completed and never handed to a worker.
+    """
+    now = time.time()
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        INSERT INTO jobs (source_type, playlist_name, source_url, format, requester_ip, status, created_at)
+        VALUES (?, ?, ?, ?, ?, 'queued', ?)
+        RETURNING id
+        """,
+        (source_type, playlist_name, source_url, format_type, requester_ip, now),
+    )
+    job_id = cursor.fetchone()["id"]
+
+    cursor.executemany(
+        """
+        INSERT INTO job_tasks (job_id, position, title, artist, source_url, status, artifact_path, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                job_id, position, item["title"], item.get("artist"), item.get("source_url"),
+                "completed" if item.get("artifact_path") else "queued", item.get("artifact_path"), now,
+            )
+            for position, item in enumerate(items)
+        ],
+    )
+    _roll_up_job(cursor, job_id, now)
+
+    conn.commit()
+    conn.close()
+    return job_id
+
+
+def claim_task(worker_id, lease_seconds=60, max_attempts=3):
+    """Lease the next queued (or abandoned) task to a worker.
+
+    The claim is a single conditional UPDATE keyed by a fresh lease token, so
+    two workers racing for the same row can never both win it. An abandoned
+    task (its lease expired, e.g. because it crashed or hung its worker) is
+    only retried while it has attempts left; otherwise it is marked failed.
+    Returns the task joined with its job's settings, or None when the queue
+    is empty.
+    """
+    now = time.time()
+    lease_token = uuid.uuid4().hex
+    claimable = "(status = 'queued' OR (status = 'running' AND lease_expires_at < ? AND attempts < ?))"
+
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        SELECT id, job_id FROM job_tasks
+        WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?
+        """,
+        (now, max_attempts),
+    )
+    exhausted = cursor.fetchall()
+    for task in exhausted:
+        cursor.execute(
+            """
+            UPDATE job_tasks
+            SET status = 'failed', error_message = 'Lease expired on the last attempt',
+                lease_owner = NULL, lease_token = NULL, lease_expires_at = NULL, updated_at = ?
+            WHERE id = ? AND status = 'running' AND lease_expires_at < ?
+            """,
+            (now, task["id"], now),
+        )
+        if cursor.rowcount:
+            _roll_up_job(cursor, task["job_id"], now)
+    if exhausted:
+        conn.commit()
+
+    cursor.execute(
+        f"""
+        UPDATE job_tasks
+        SET status = 'running',
+            lease_owner = ?,
+            lease_token = ?,
+            lease_expires_at = ?,
+            attempts = attempts + 1,
+            updated_at = ?
+        WHERE id = (
+            SELECT id FROM job_tasks
+            WHERE {claimable}
+            ORDER BY job_id, position
+            LIMIT 1
+            {_dialect()["skip_locked"]}
+        )
+        AND {claimable}
+        """,
+        (worker_id, lease_token, now + lease_seconds, now, now, max_attempts, now, max_attempts),
+    )
+    conn.commit()
+
+    if cursor.rowcount == 0:
+        conn.close()
+        return None
+
+    cursor.execute(
+        """
+        SELECT t.id, t.job_id, t.position, t.title, t.artist, t.source_url, t.attempts,
+               t.lease_token, j.source_type, j.playlist_name, j.format
+        FROM job_tasks t
+        JOIN jobs j ON j.id = t.job_id
+        WHERE t.lease_token = ?
+        """,
+        (lease_token,),
+    )
+    task = cursor.fetchone()
+
+    cursor.execute(
+        "UPDATE jobs SET status = 'running' WHERE id = ? AND status = 'queued'",
+        (task["job_id"],),
+    )
+    conn.commit()
+    conn.close()
+    return dict(task)
+
+
+def get_leased_task(task_id, lease_token):
+    """Get a running task with its job's settings if lease_token still owns it, else None."""
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        SELECT t.id, t.job_id, t.title, t.artist, j.playlist_name, j.format
+        FROM job_tasks t
+        JOIN jobs j ON j.id = t.job_id
+        WHERE t.id = ? AND t.lease_token = ? AND t.status = 'running'
+        """,
+        (task_id, lease_token),
+    )
+    task = cursor.fetchone()
+    conn.close()
+    return dict(task) if task else None
+
+
+def heartbeat_task(task_id, lease_token, lease_seconds=60):
+    """Extend a lease; returns False if the worker no longer owns the task."""
+    now = time.time()
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        UPDATE job_tasks
+        SET lease_expires_at = ?, updated_at = ?
+        WHERE id = ? AND lease_token = ? AND status = 'running'
+        """,
+        (now + lease_seconds, now, task_id, lease_token),
+    )
+    owned = cursor.rowcount == 1
+
+    conn.commit()
+    conn.close()
+    return owned
+
+
+def complete_task(task_id, lease_token, artifact_path=None):
+    """Record a finished task and the path of the file it produced."""
+    return _finish_task(task_id, lease_token, "completed", artifact_path=artifact_path)
+
+
+def fail_task(task_id, lease_token, error_message, max_attempts=3):
+    """Record a failed attempt, re-queueing the task until max_attempts."""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT attempts FROM job_tasks WHERE id = ?", (task_id,))
+    row = cursor.fetchone()
+    conn.close()
+
+    status = "queued" if row and row["attempts"] < max_attempts else "failed"
+    return _finish_task(task_id, lease_token, status, error_message=error_message)
+
+
+def _finish_task(task_id, lease_token, status, artifact_path=None, error_message=None):
+    """Release a lease with a final (or re-queued) status and roll up the job."""
+    now = time.time()
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        UPDATE job_tasks
+        SET status = ?, artifact_path = ?, error_message = ?,
+            lease_owner = NULL, lease_token = NULL, lease_expires_at = NULL, updated_at = ?
+        WHERE id = ? AND lease_token = ?
+        """,
+        (status, artifact_path, error_message, now, task_id, lease_token),
+    )
+    released = cursor.rowcount == 1
+
+    if released:
+        cursor.execute("SELECT job_id FROM job_tasks WHERE id = ?", (task_id,))
+        _roll_up_job(cursor, cursor.fetchone()["job_id"], now)
+
+    conn.commit()
+    conn.close()
+    return released
+
+
+def _roll_up_job(cursor, job_id, now):
+    """Finish a job once none of its tasks are pending.
+
+    The job ends ``completed`` if every task succeeded, ``failed`` if none
+    did, and ``completed_with_errors`` otherwise.
+    """
+    cursor.execute(
+        """
+        UPDATE jobs
+        SET status = CASE
+                WHEN NOT EXISTS (
+                    SELECT 1 FROM job_tasks WHERE job_id = jobs.id AND status = 'failed'
+                ) THEN 'completed'
+                WHEN NOT EXISTS (
+                    SELECT 1 FROM job_tasks WHERE job_id = jobs.id AND status = 'completed'
+                ) THEN 'failed'
+                ELSE 'completed_with_errors'
+            END,
+            finished_at = ?
+        WHERE id = ?
+        AND NOT EXISTS (
+            SELECT 1 FROM job_tasks
+            WHERE job_id = jobs.id AND status IN ('queued', 'running')
+        )
+        """,
+        (now, job_id),
+    )
+
+
+def get_job(job_id):
+    """Get a job with per-task progress and artifacts, or None."""
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        SELECT id, source_type, playlist_name, source_url, format, status, created_at, finished_at
+        FROM jobs
+        WHERE id = ?
+        """,
+        (job_id,),
+    )
+    job = cursor.fetchone()
+
+    if job is None:
+        conn.close()
+        return None
+
+    cursor.execute(
+        """
+        SELECT id, position, title, artist, status, attempts, lease_owner, artifact_path, error_message
+        FROM job_tasks
+        WHERE job_id = ?
+        ORDER BY position
+        """,
+        (job_id,),
+    )
+    tasks = [dict(task) for task in cursor.fetchall()]
+    conn.close()
+
+    job = dict(job)
+    job["tasks"] = tasks
+    job["total"] = len(tasks)
+    job["completed"] = sum(1 for task in tasks if task["status"] == "completed")
+    job["failed"] = sum(1 for task in tasks if task["status"] == "failed")
+    return job
+
+
+def get_library_folder_mtime(folder):
+    """Get the directory mtime recorded at the last scan of folder, or None."""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT mtime FROM library_folders WHERE folder = ?", (folder,))
+    row = cursor.fetchone()
+    conn.close()
+    return row["mtime"] if row else None
+
+
+def get_library_files(folder):
+    """Get the indexed files of one folder keyed by path."""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT path, folder, filename, video_id, format, size, mtime, checksum
+        FROM library_files
+        WHERE folder = ?
+        """,
+        (folder,),
+    )
+    files = {row["path"]: dict(row) for row in cursor.fetchall()}
+    conn.close()
+    return files
+
+
+def save_library_scan(folder, folder_mtime, upserts, removed_paths):
+    """Apply one folder scan: upsert changed files, drop vanished ones, stamp the folder."""
+    now = time.time()
+    conn = get_db()
+    cursor = conn.cursor()
+
+    cursor.executemany(
+        """
+        INSERT INTO library_files (path, folder, filename, video_id, format, size, mtime, checksum, indexed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (path) DO UPDATE SET
+            video_id = COALESCE(excluded.video_id, library_files.video_id),
+            format = COALESCE(excluded.format, library_files.format),
+            size = excluded.size,
+            mtime = excluded.mtime,
+            checksum = excluded.checksum,
+            indexed_at = excluded.indexed_at
+        """,
+        [
+            (
+                entry["path"], folder, entry["filename"], entry.get("video_id"), entry.get("format"),
+                entry["size"], entry["mtime"], entry["checksum"], now,
+            )
+            for entry in upserts
+        ],
+    )
+
+    cursor.executemany("DELETE FROM library_files WHERE path = ?", [(path,) for path in removed_paths])
+
+    if folder_mtime is not None:
+        cursor.execute(
+            """
+            INSERT INTO library_folders (folder, mtime, scanned_at) VALUES (?, ?, ?)
+            ON CONFLICT (folder) DO UPDATE SET mtime = excluded.mtime, scanned_at = excluded.scanned_at
+            """,
+            (folder, folder_mtime, now),
+        )
+
+    conn.commit()
+    conn.close()
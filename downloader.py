@@ -0,0 +1,538 @@
+import copy
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+YOUTUBE_ID_PATTERN = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([0-9A-Za-z_-]{11})')
+
+# Extracted info embeds signed stream URLs that expire after a few hours, so
+# cached entries are only trusted for a short window. Each entry still holds
+# the full format list (tens of KB), so the cache stays small.
+INFO_CACHE_SIZE = int(os.getenv("INFO_CACHE_SIZE", 64))
+# Bulky info fields that format selection and downloading never read
+INFO_CACHE_DROPPED_KEYS = (
+    "subtitles",
+    "automatic_captions",
+    "requested_subtitles",
+    "heatmap",
+    "thumbnails",
+    "chapters",
+    "comments",
+    "description",
+)
+INFO_CACHE_TTL = float(os.getenv("INFO_CACHE_TTL", 900))
+
+# Segmented mode fetches MP4 video and audio streams in parallel, each over
+# several concurrent range requests (or fragment downloads for HLS/DASH).
+SEGMENTED_DOWNLOADS = os.getenv("SEGMENTED_DOWNLOADS", "false").lower() == "true"
+DOWNLOAD_CONNECTIONS = int(os.getenv("DOWNLOAD_CONNECTIONS", 4))
+SEGMENT_CHUNK_SIZE = int(os.getenv("SEGMENT_CHUNK_SIZE", 10 * 1024 * 1024))
+# Bytes per second one job may use across all its connections; 0 = unlimited
+JOB_BANDWIDTH_LIMIT = int(os.getenv("JOB_BANDWIDTH_LIMIT", 0))
+
+# Playlist tracks resolved concurrently ahead of the one being downloaded
+LOOKAHEAD_DEPTH = int(os.getenv("LOOKAHEAD_DEPTH", 3))
+
+
+class InfoCache:
+    """Thread-safe LRU cache of extracted video info with a time-to-live."""
+
+    def __init__(self, max_entries=INFO_CACHE_SIZE, ttl=INFO_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, video_id):
+        """Return a private copy of the cached info, or None if missing or stale."""
+        if not video_id:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None:
+                return None
+
+            stored_at, info = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[video_id]
+                return None
+
+            self._entries.move_to_end(video_id)
+
+        # yt-dlp mutates info dicts while processing, so never hand out the original
+        return copy.deepcopy(info)
+
+    def put(self, info):
+        """Store an info dict under its video ID, evicting the least recently used.
+
+        Fields listed in ``INFO_CACHE_DROPPED_KEYS`` are not kept.
+        """
+        video_id = info.get("id")
+        if not video_id or self.max_entries <= 0:
+            return
+
+        slim = {key: value for key, value in info.items() if key not in INFO_CACHE_DROPPED_KEYS}
+        slim = copy.deepcopy(slim)
+        with self._lock:
+            self._entries[video_id] = (time.monotonic(), slim)
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, video_id):
+        """Forget one entry, e.g. after its stream URLs were rejected."""
+        with self._lock:
+            self._entries.pop(video_id, None)
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+info_cache = InfoCache()
+
+
+def sanitize_filename(filename):
+    """Clean filename for safe file system storage"""
+    # Remove invalid characters
+    filename = re.sub(r'[<>:"/\\|?*]', '', filename)
+    # Limit length
+    filename = filename[:200]
+    return filename.strip()
+
+
+def track_filename(title, artist=None):
+    """File name (without extension) a queued track or video is saved under."""
+    return sanitize_filename(f"{artist} - {title}" if artist else title)
+
+
+# Output profiles selectable through the API's ``format`` field. Audio
+# profiles with a ``codec`` go through FFmpegExtractAudio, which stream-copies
+# instead of re-encoding when the source already uses that codec (AAC for
+# m4a, Opus for opus), so their ``format`` prefers such sources. Quality
+# values below 10 are LAME VBR levels; larger ones are CBR bitrates.
+ENCODING_PROFILES = {
+    "mp3": {"format": "bestaudio/best", "codec": "mp3", "quality": "192", "ext": "mp3"},
+    "mp3-v0": {"format": "bestaudio/best", "codec": "mp3", "quality": "0", "ext": "mp3"},
+    "mp3-v2": {"format": "bestaudio/best", "codec": "mp3", "quality": "2", "ext": "mp3"},
+    "mp3-v5": {"format": "bestaudio/best", "codec": "mp3", "quality": "5", "ext": "mp3"},
+    "m4a": {"format": "bestaudio[acodec^=mp4a]/bestaudio/best", "codec": "m4a", "quality": None, "ext": "m4a"},
+    "opus": {"format": "bestaudio[acodec=opus]/bestaudio/best", "codec": "opus", "quality": None, "ext": "opus"},
+    # Keep whatever container and codec YouTube serves; nothing is re-encoded
+    "original": {"format": "bestaudio/best", "codec": None, "quality": None, "ext": None},
+    "mp4": {"format": "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best", "codec": None, "quality": None, "ext": "mp4"},
+}
+
+DEFAULT_PROFILE = "mp3"
+
+# Containers the "original" profile can produce
+ORIGINAL_AUDIO_EXTENSIONS = (".m4a", ".webm", ".opus", ".ogg", ".mp3", ".mp4")
+
+
+def resolve_profile(format_type):
+    """Map a requested format onto a known profile name, defaulting to MP3."""
+    return format_type if format_type in ENCODING_PROFILES else DEFAULT_PROFILE
+
+
+def output_extension(format_type):
+    """Return the file extension produced for a format, or None if it depends on the source."""
+    ext = ENCODING_PROFILES[resolve_profile(format_type)]["ext"]
+    return f".{ext}" if ext else None
+
+
+def output_extensions(format_type):
+    """Return every extension a finished download of this format may have."""
+    ext = output_extension(format_type)
+    return (ext,) if ext else ORIGINAL_AUDIO_EXTENSIONS
+
+
+def build_ydl_opts(filepath, format_type="mp3"):
+    """Build yt-dlp download options for an encoding profile."""
+    profile = ENCODING_PROFILES[resolve_profile(format_type)]
+    ydl_opts = {
+        "format": profile["format"],
+        "outtmpl": filepath,
+        "quiet": True,
+        "no_warnings": True,
+    }
+
+    if resolve_profile(format_type) == "mp4":
+        # Download video (MP4)
+        ydl_opts["merge_output_format"] = "mp4"
+    elif profile["codec"]:
+        postprocessor = {
+            "key": "FFmpegExtractAudio",
+            "preferredcodec": profile["codec"],
+        }
+        if profile["quality"]:
+            postprocessor["preferredquality"] = profile["quality"]
+        ydl_opts["postprocessors"] = [postprocessor]
+    else:
+        # Source container decides the extension
+        ydl_opts["outtmpl"] = f"{filepath}.%(ext)s"
+
+    if SEGMENTED_DOWNLOADS:
+        ydl_opts["concurrent_fragment_downloads"] = DOWNLOAD_CONNECTIONS
+    if JOB_BANDWIDTH_LIMIT:
+        ydl_opts["ratelimit"] = JOB_BANDWIDTH_LIMIT
+
+    return ydl_opts
+
+
+def search_youtube_video(song_name, artist):
+    """Find best matching YouTube video"""
+    query = f"{artist} {song_name} official audio".strip()
+    return f"ytsearch1:{query}"
+
+
+def fetch_video_info(youtube_url, video_id=None):
+    """Extract metadata for a single video without downloading it.
+
+    Served from ``info_cache`` when the video was extracted recently. A
+    ytsearch query resolves to its first result.
+    """
+    video_id = video_id or extract_video_id(youtube_url)
+    info = info_cache.get(video_id)
+    if info is not None:
+        return info
+
+    import yt_dlp  # deferred: loading the extractor registry is slow
+
+    ydl_opts = {
+        "quiet": True,
+        "no_warnings": True,
+    }
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(youtube_url, download=False)
+
+    if info.get("entries") is not None:
+        entries = [entry for entry in info["entries"] if entry]
+        if not entries:
+            raise ValueError(f"No video found for {youtube_url}")
+        info = entries[0]
+
+    # The sanitized form is what `yt-dlp --load-info-json` replays, so it can be
+    # handed straight back to process_ie_result for the download.
+    info = yt_dlp.YoutubeDL.sanitize_info(info)
+    info_cache.put(info)
+    return info
+
+
+def fetch_playlist_info(playlist_url):
+    """Extract flat playlist metadata without resolving every entry."""
+    import yt_dlp
+
+    ydl_opts = {
+        "quiet": True,
+        "no_warnings": True,
+        "extract_flat": True,  # Don't download, just extract info
+    }
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        return ydl.extract_info(playlist_url, download=False)
+
+
+def download_media(youtube_url, filepath, format_type="mp3", video_id=None):
+    """Download a URL to filepath, raising on yt-dlp errors.
+
+    Reuses the (possibly cached) probe info via process_ie_result instead of
+    letting ``download()`` run the extractor a second time. Returns the path
+    of the finished file.
+    """
+    import subprocess
+    import yt_dlp
+
+    info = fetch_video_info(youtube_url, video_id)
+
+    if SEGMENTED_DOWNLOADS and resolve_profile(format_type) == "mp4":
+        try:
+            output_path = download_segmented(info, filepath, format_type)
+        except (OSError, subprocess.CalledProcessError) as e:
+            # e.g. a 403 from an expired stream URL: re-extract and let yt-dlp retry
+            print(f"Segmented download failed for {youtube_url}, falling back to yt-dlp: {e}")
+            info_cache.discard(info.get("id"))
+            output_path = None
+            info = fetch_video_info(youtube_url, video_id)
+        if output_path:
+            return output_path
+
+    with yt_dlp.YoutubeDL(build_ydl_opts(filepath, format_type)) as ydl:
+        info = ydl.process_ie_result(info, download=True)
+
+    # Postprocessors rewrite filepath to the converted or remuxed output
+    requested = info.get("requested_downloads") or [{}]
+    return requested[-1].get("filepath") or f"{filepath}{output_extension(format_type) or ''}"
+
+
+def download_segmented(info, filepath, format_type="mp4"):
+    """Fetch the selected streams in parallel over range requests and mux them.
+
+    Video and audio are downloaded at the same time, each split across
+    ``DOWNLOAD_CONNECTIONS`` range requests, all sharing one per-job
+    ``JOB_BANDWIDTH_LIMIT`` budget, then merged with an ffmpeg stream copy.
+    Returns the output path, or None when a selected stream is not a plain
+    HTTP(S) file so the caller should let yt-dlp handle it.
+    """
+    import subprocess
+    import yt_dlp
+    from concurrent.futures import ThreadPoolExecutor
+    from segmented import BandwidthBudget, fetch_ranged
+
+    # Format selection only; nothing is downloaded by this pass
+    with yt_dlp.YoutubeDL(build_ydl_opts(filepath, format_type)) as ydl:
+        selected = ydl.process_ie_result(info, download=False)
+
+    streams = selected.get("requested_formats") or [selected]
+    if any(stream.get("protocol") not in ("http", "https") for stream in streams):
+        return None
+
+    budget = BandwidthBudget(JOB_BANDWIDTH_LIMIT)
+    part_paths = [f"{filepath}.f{stream['format_id']}.{stream['ext']}" for stream in streams]
+
+    def fetch(stream, part_path):
+        chunk_size = (stream.get("downloader_options") or {}).get("http_chunk_size") or SEGMENT_CHUNK_SIZE
+        fetch_ranged(
+            stream["url"],
+            part_path,
+            headers=stream.get("http_headers"),
+            connections=DOWNLOAD_CONNECTIONS,
+            chunk_size=min(chunk_size, SEGMENT_CHUNK_SIZE),
+            size=stream.get("filesize"),
+            budget=budget,
+        )
+
+    output_path = f"{filepath}.{selected.get('ext') or 'mp4'}"
+    try:
+        with ThreadPoolExecutor(max_workers=len(streams)) as pool:
+            for future in [pool.submit(fetch, stream, part) for stream, part in zip(streams, part_paths)]:
+                future.result()
+
+        if len(part_paths) == 1:
+            os.replace(part_paths[0], output_path)
+        else:
+            command = ["ffmpeg", "-y", "-loglevel", "error"]
+            for part_path in part_paths:
+                command += ["-i", part_path]
+            for index, stream in enumerate(streams):
+                kind = "a" if stream.get("vcodec") == "none" else "v"
+                command += ["-map", f"{index}:{kind}:0"]
+            command += ["-c", "copy", output_path]
+            subprocess.run(command, check=True, capture_output=True)
+        return output_path
+    except BaseException:
+        # Never leave a half-merged file where yt-dlp would take it as finished
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    finally:
+        for part_path in part_paths:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+
+def extract_video_id(youtube_url):
+    """Pull the 11-character video ID out of a YouTube URL, or None."""
+    match = YOUTUBE_ID_PATTERN.search(youtube_url or '')
+    return match.group(1) if match else None
+
+
+def resolve_video(youtube_url):
+    """Resolve a URL or ytsearch query to (watch URL, video ID).
+
+    Plain video URLs are parsed locally; searches run a flat extraction so
+    only the result list is fetched. Returns (None, None) for empty searches.
+    """
+    video_id = extract_video_id(youtube_url)
+    if video_id:
+        return youtube_url, video_id
+
+    import yt_dlp
+
+    ydl_opts = {
+        "quiet": True,
+        "no_warnings": True,
+        "extract_flat": "in_playlist",
+    }
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(youtube_url, download=False)
+
+    if info.get('entries') is not None:
+        entries = [entry for entry in info['entries'] if entry]
+        if not entries:
+            return None, None
+        info = entries[0]
+
+    video_id = info.get('id')
+    return info.get('webpage_url') or info.get('url') or youtube_url, video_id
+
+
+def resolve_track(song_name, artist):
+    """Search for a track and pre-extract its formats into ``info_cache``.
+
+    Returns (watch URL, video ID), or (None, None) when the search is empty.
+    Search errors propagate. Extraction is only a cache warm-up, so its
+    errors are left for the download to hit and report.
+    """
+    video_url, video_id = resolve_video(search_youtube_video(song_name, artist))
+    if video_url:
+        try:
+            fetch_video_info(video_url, video_id)
+        except Exception as e:
+            print(f"Prefetch of {video_url} failed: {e}")
+    return video_url, video_id
+
+
+class Lookahead:
+    """Runs ``func`` over a list ahead of the consumer, at most ``depth`` items ahead.
+
+    ``result(index)`` returns ``func(items[index])`` (re-raising its error) and
+    keeps the following items in flight on a small thread pool, so their
+    latency overlaps with whatever the caller does with the current one.
+    """
+
+    def __init__(self, items, func, depth=LOOKAHEAD_DEPTH):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.items = items
+        self.func = func
+        self.depth = max(depth, 0)
+        self._futures = {}
+        self._pool = ThreadPoolExecutor(max_workers=self.depth + 1, thread_name_prefix="lookahead")
+
+    def schedule(self, index):
+        """Start work on the item at index and the ``depth`` items after it."""
+        for ahead in range(index, min(index + self.depth + 1, len(self.items))):
+            if ahead not in self._futures:
+                self._futures[ahead] = self._pool.submit(self.func, self.items[ahead])
+        for done in [key for key in self._futures if key < index]:
+            del self._futures[done]
+
+    def result(self, index):
+        """Wait for the item at index, scheduling the next ``depth`` items."""
+        self.schedule(index)
+        return self._futures[index].result()
+
+    def finished(self, start):
+        """Yield (index, result or exception) for items from start on that are already done."""
+        for index, future in sorted(self._futures.items()):
+            if index >= start and future.done() and not future.cancelled():
+                yield index, future.exception() or future.result()
+
+    def close(self):
+        """Drop work that has not started yet; running items finish in the background."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _InFlightDownload:
+    """One running download plus the extra destinations waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+        self.extension = ''
+        self.targets = []
+        self.target_errors = {}
+
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def share_artifact(source, target):
+    """Place a copy of a finished download at target, hard-linking when possible."""
+    if os.path.abspath(source) == os.path.abspath(target):
+        return
+
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def download_shared(youtube_url, video_id, filepath, format_type="mp3"):
+    """Download to filepath, coalescing identical concurrent requests.
+
+    Requests for the same (video ID, format) that arrive while a download is
+    running wait for it instead of fetching and transcoding a second time; the
+    finished file is linked or copied to each waiter's own path before the
+    leader releases the key, so temp-folder cleanup can't race the handoff.
+    Returns the path of the file produced for this caller.
+
+    The in-flight table is per process: threads of one server process share
+    downloads, but separate Gunicorn worker processes and ``python -m worker``
+    processes each fetch the same video themselves.
+    """
+    if not video_id:
+        return download_media(youtube_url, filepath, format_type)
+
+    key = (video_id, resolve_profile(format_type))
+    with _in_flight_lock:
+        flight = _in_flight.get(key)
+        is_leader = flight is None
+        if is_leader:
+            flight = _in_flight[key] = _InFlightDownload()
+        else:
+            flight.targets.append(filepath)
+
+    if not is_leader:
+        flight.done.wait()
+        error = flight.error or flight.target_errors.get(filepath)
+        if error is not None:
+            raise error
+        return f"{filepath}{flight.extension}"
+
+    output_path = None
+    try:
+        output_path = download_media(youtube_url, filepath, format_type, video_id)
+        flight.extension = os.path.splitext(output_path)[1]
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+
+        if flight.error is None:
+            for waiting_filepath in flight.targets:
+                try:
+                    share_artifact(output_path, f"{waiting_filepath}{flight.extension}")
+                except OSError as e:
+                    flight.target_errors[waiting_filepath] = e
+
+        flight.done.set()
+
+    return output_path
+
+
+def zip_playlist_folder(playlist_folder, zip_path, format_type="mp3"):
+    """Bundle the downloaded files of one format into a ZIP archive."""
+    import zipfile
+
+    file_extensions = output_extensions(format_type)
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for root, dirs, files in os.walk(playlist_folder):
+            for file in files:
+                if file.endswith(file_extensions):
+                    file_path = os.path.join(root, file)
+                    zipf.write(file_path, file)
+
+    return zip_path
+
+
+def zip_files(file_paths, zip_path):
+    """Bundle the given files, by base name, into a ZIP archive."""
+    import zipfile
+
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for file_path in file_paths:
+            zipf.write(file_path, os.path.basename(file_path))
+
+    return zip_path
@@ -0,0 +1,106 @@
+"""Persistent index of the files already present in the download folders.
+
+Each playlist folder is rescanned only when its directory mtime changes,
+which happens whenever a file is added, removed or renamed (yt-dlp always
+writes to a ``.part`` file and renames it). Within a rescan, only files
+whose size or mtime moved are re-hashed, so re-syncing a large playlist
+costs one ``stat`` of the folder plus a lookup.
+"""
+import hashlib
+import os
+
+import database as db
+from downloader import output_extensions, resolve_profile, ORIGINAL_AUDIO_EXTENSIONS
+
+# Every extension a finished download can have; partial files are ignored
+MEDIA_EXTENSIONS = tuple(set(ORIGINAL_AUDIO_EXTENSIONS) | {'.mp3', '.mp4'})
+
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+
+def file_checksum(path):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(CHECKSUM_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sync_folder(folder):
+    """Bring the index for one folder up to date and return its files by path."""
+    folder = os.path.abspath(folder)
+
+    try:
+        folder_mtime = os.stat(folder).st_mtime
+    except FileNotFoundError:
+        return {}
+
+    indexed = db.get_library_files(folder)
+    if db.get_library_folder_mtime(folder) == folder_mtime:
+        return indexed
+
+    upserts = []
+    present = set()
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.is_file() or not entry.name.endswith(MEDIA_EXTENSIONS):
+                continue
+
+            stat = entry.stat()
+            present.add(entry.path)
+            known = indexed.get(entry.path)
+            if known and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+                continue
+
+            upserts.append({
+                'path': entry.path,
+                'filename': entry.name,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'checksum': file_checksum(entry.path),
+            })
+
+    removed = [path for path in indexed if path not in present]
+    db.save_library_scan(folder, folder_mtime, upserts, removed)
+    return db.get_library_files(folder) if upserts or removed else indexed
+
+
+def find_track(folder, filename, format_type):
+    """Return the path of an indexed, non-empty file for this track and format, or None.
+
+    ``filename`` is the sanitized name without extension. Files the app
+    downloaded itself carry their encoding profile and only match that
+    profile (a 192 kbps ``.mp3`` does not satisfy ``mp3-v0``); files found by
+    a folder scan are matched by extension alone.
+    """
+    profile = resolve_profile(format_type)
+    files = sync_folder(folder)
+    for extension in output_extensions(format_type):
+        entry = files.get(os.path.join(os.path.abspath(folder), f"{filename}{extension}"))
+        if not entry or entry['size'] <= 0:
+            continue
+        if entry['format'] and resolve_profile(entry['format']) != profile:
+            continue
+        return entry['path']
+    return None
+
+
+def record_download(path, video_id, format_type):
+    """Index a file the app just produced, keeping its video ID and format."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    db.save_library_scan(
+        os.path.dirname(path),
+        None,
+        [{
+            'path': path,
+            'filename': os.path.basename(path),
+            'video_id': video_id,
+            'format': format_type,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'checksum': file_checksum(path),
+        }],
+        [],
+    )
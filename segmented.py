@@ -0,0 +1,117 @@
+"""Concurrent HTTP range fetching with a shared bandwidth budget.
+
+A single HTTP stream is often throttled per connection, so large files are
+split into byte ranges fetched by several connections at once and written
+straight into place in a preallocated file. All connections of one job draw
+from the same ``BandwidthBudget`` so a big video cannot starve other jobs.
+"""
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+READ_SIZE = 64 * 1024
+# Longest burst a budget allows after an idle period
+BURST_SECONDS = 0.25
+REQUEST_TIMEOUT = 30
+SEGMENT_RETRIES = 3
+
+
+class BandwidthBudget:
+    """Token bucket shared by every connection of one job (bytes per second)."""
+
+    def __init__(self, bytes_per_second=None):
+        self.rate = bytes_per_second or 0
+        self._allowance = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        """Account for amount bytes, sleeping while the job is over budget."""
+        if not self.rate:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate * BURST_SECONDS, self._allowance + (now - self._last) * self.rate)
+            self._last = now
+            self._allowance -= amount
+            wait = -self._allowance / self.rate if self._allowance < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+
+
+def _open(url, headers, byte_range=None):
+    request_headers = dict(headers or {})
+    if byte_range is not None:
+        request_headers['Range'] = 'bytes=%d-%d' % byte_range
+    return urllib.request.urlopen(urllib.request.Request(url, headers=request_headers), timeout=REQUEST_TIMEOUT)
+
+
+def probe_ranges(url, headers=None):
+    """Ask for the first byte; returns (server honours Range, total size or None)."""
+    with _open(url, headers, (0, 0)) as response:
+        if response.status != 206:
+            return False, None
+        content_range = response.headers.get('Content-Range', '')
+        total = content_range.rpartition('/')[2]
+        return True, int(total) if total.isdigit() else None
+
+
+def _copy(response, handle, budget):
+    written = 0
+    while True:
+        chunk = response.read(READ_SIZE)
+        if not chunk:
+            return written
+        budget.consume(len(chunk))
+        handle.write(chunk)
+        written += len(chunk)
+
+
+def _fetch_range(url, dest, headers, start, end, budget):
+    expected = end - start + 1
+    for attempt in range(1, SEGMENT_RETRIES + 1):
+        try:
+            with _open(url, headers, (start, end)) as response, open(dest, 'r+b') as handle:
+                if response.status != 206:
+                    raise OSError(f"range request returned HTTP {response.status}")
+                handle.seek(start)
+                written = _copy(response, handle, budget)
+            if written != expected:
+                raise OSError(f"short segment {start}-{end}: {written} of {expected} bytes")
+            return written
+        except OSError:
+            if attempt == SEGMENT_RETRIES:
+                raise
+
+
+def fetch_ranged(url, dest, headers=None, connections=4, chunk_size=10 * 1024 * 1024, size=None, budget=None):
+    """Download url to dest over up to ``connections`` concurrent range requests.
+
+    The file is split into ``chunk_size`` pieces (some hosts throttle larger
+    ranges) handed out to the connection pool. Range support is always
+    probed first, since a known ``size`` says nothing about it; ``size`` only
+    fills in when the probe does not report a total. Falls back to one plain
+    stream when the server does not support ranges. Returns the number of
+    bytes written.
+    """
+    budget = budget or BandwidthBudget()
+    if connections > 1:
+        ranged, total = probe_ranges(url, headers)
+        size = (total or size) if ranged else None
+
+    if not size or connections <= 1:
+        with _open(url, headers) as response, open(dest, 'wb') as handle:
+            return _copy(response, handle, budget)
+
+    chunk_size = max(READ_SIZE, min(chunk_size, -(-size // connections)))
+    ranges = [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+
+    with open(dest, 'wb') as handle:
+        handle.truncate(size)
+
+    with ThreadPoolExecutor(max_workers=min(connections, len(ranges))) as pool:
+        futures = [pool.submit(_fetch_range, url, dest, headers, start, end, budget) for start, end in ranges]
+        return sum(future.result() for future in futures)
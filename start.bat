@@ -59,6 +59,9 @@ echo.
 echo Press Ctrl+C to stop the server
 echo.
 
+REM Fingerprint and precompress CSS/JS
+python assets.py > nul
+
 python app.py
 
 pause
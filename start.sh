@@ -32,6 +32,9 @@ if [ ! -f ".env" ]; then
     read -p "Press Enter after you've updated .env file..."
 fi
 
+# Fingerprint and precompress CSS/JS
+python3 assets.py > /dev/null
+
 echo ""
 echo "✅ Starting Flask application..."
 echo ""
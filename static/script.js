@@ -1,7 +1,12 @@
 let progressInterval = null;
 let downloadLocation = "device";
 let allowServerStorage = false;
+let jobQueue = false;
 let importedPlaylist = null;
+let activeTrackView = null;
+
+const trackViews = {};
+const resultLists = {};
 
 function showMessage(message, tone = "info") {
     const notice = document.getElementById("globalMessage");
@@ -99,6 +104,217 @@ function createTrackRow(index, title, meta) {
     return row;
 }
 
+function createVirtualList(container, renderRow, { gap = 0, overscan = 8, updateRow = null } = {}) {
+    // Only the rows inside the scroll viewport (plus overscan) exist in the DOM.
+    // Rows are absolutely positioned over a spacer sized to the full list, and
+    // every change is coalesced into one render per animation frame.
+    const isList = container.tagName === "UL" || container.tagName === "OL";
+    const spacer = document.createElement(isList ? "li" : "div");
+    spacer.className = "virtual-list-spacer";
+    spacer.setAttribute("aria-hidden", "true");
+
+    container.innerHTML = "";
+    container.classList.add("virtual-list");
+    container.appendChild(spacer);
+
+    const rows = new Map();
+    const dirty = new Set();
+    let items = [];
+    let rowPitch = 0;
+    let frame = null;
+
+    function scheduleRender() {
+        if (frame === null) {
+            frame = requestAnimationFrame(render);
+        }
+    }
+
+    function measureRowPitch() {
+        const probe = renderRow(items[0], 0);
+        probe.classList.add("virtual-row");
+        probe.style.visibility = "hidden";
+        container.appendChild(probe);
+        const height = probe.offsetHeight;
+        probe.remove();
+        return height ? height + gap : 0;
+    }
+
+    function mountRow(item, index) {
+        const element = renderRow(item, index);
+        element.classList.add("virtual-row");
+        element.style.transform = `translateY(${index * rowPitch}px)`;
+        rows.set(index, { element, item });
+        return element;
+    }
+
+    function render() {
+        frame = null;
+
+        if (!items.length) {
+            rows.forEach((row) => row.element.remove());
+            rows.clear();
+            dirty.clear();
+            spacer.style.height = "0px";
+            return;
+        }
+
+        if (!rowPitch) {
+            // Hidden containers have no layout yet; try again on the next change
+            rowPitch = measureRowPitch();
+            if (!rowPitch) {
+                return;
+            }
+        }
+
+        spacer.style.height = `${items.length * rowPitch - gap}px`;
+
+        const first = Math.max(0, Math.floor(container.scrollTop / rowPitch) - overscan);
+        const last = Math.min(
+            items.length - 1,
+            Math.ceil((container.scrollTop + container.clientHeight) / rowPitch) + overscan
+        );
+
+        rows.forEach((row, index) => {
+            if (index < first || index > last) {
+                row.element.remove();
+                rows.delete(index);
+            }
+        });
+
+        const fragment = document.createDocumentFragment();
+        for (let index = first; index <= last; index += 1) {
+            const item = items[index];
+            const row = rows.get(index);
+            const isDirty = dirty.has(index);
+
+            if (!row || row.item !== item || (isDirty && !updateRow)) {
+                if (row) {
+                    row.element.remove();
+                }
+                fragment.appendChild(mountRow(item, index));
+            } else if (isDirty) {
+                updateRow(row.element, item, index);
+            }
+        }
+
+        container.appendChild(fragment);
+        dirty.clear();
+    }
+
+    container.addEventListener("scroll", scheduleRender, { passive: true });
+
+    return {
+        setItems(nextItems) {
+            items = nextItems;
+            scheduleRender();
+        },
+        refresh(indices) {
+            (indices || rows.keys()).forEach((index) => dirty.add(index));
+            scheduleRender();
+        },
+    };
+}
+
+function applyTrackStatus(row, status) {
+    row.classList.remove("is-current", "is-completed", "is-failed");
+    if (status) {
+        row.classList.add(`is-${status}`);
+    }
+}
+
+function getTrackView(containerId, describe) {
+    if (!trackViews[containerId]) {
+        const view = {
+            describe,
+            statuses: new Map(),
+            indicesByKey: new Map(),
+        };
+
+        view.list = createVirtualList(
+            document.getElementById(containerId),
+            (item, index) => {
+                const { key, title, meta } = describe(item);
+                const row = createTrackRow(index, title, meta);
+                applyTrackStatus(row, view.statuses.get(key));
+                return row;
+            },
+            {
+                gap: 10,
+                updateRow: (row, item) => applyTrackStatus(row, view.statuses.get(describe(item).key)),
+            }
+        );
+
+        trackViews[containerId] = view;
+    }
+
+    return trackViews[containerId];
+}
+
+function showTracks(containerId, items, describe) {
+    const view = getTrackView(containerId, describe);
+    view.statuses = new Map();
+    view.indicesByKey = new Map();
+
+    items.forEach((item, index) => {
+        const { key } = describe(item);
+        if (!view.indicesByKey.has(key)) {
+            view.indicesByKey.set(key, []);
+        }
+        view.indicesByKey.get(key).push(index);
+    });
+
+    document.getElementById(containerId).scrollTop = 0;
+    view.list.setItems(items);
+    return view;
+}
+
+function trackStatusesFromProgress(progress) {
+    const statuses = new Map();
+    progress.completed.forEach((track) => statuses.set(track, "completed"));
+    progress.failed.forEach((item) => statuses.set(item.track, "failed"));
+
+    if (progress.status === "downloading" && progress.current_track && !statuses.has(progress.current_track)) {
+        statuses.set(progress.current_track, "current");
+    }
+
+    return statuses;
+}
+
+function updateTrackStatuses(progress) {
+    if (!activeTrackView) {
+        return;
+    }
+
+    // Keyed diff: only rows whose status changed since the last tick are touched
+    const next = trackStatusesFromProgress(progress);
+    const previous = activeTrackView.statuses;
+    const changed = [];
+
+    new Set([...previous.keys(), ...next.keys()]).forEach((key) => {
+        if (previous.get(key) !== next.get(key)) {
+            changed.push(...(activeTrackView.indicesByKey.get(key) || []));
+        }
+    });
+
+    activeTrackView.statuses = next;
+    if (changed.length) {
+        activeTrackView.list.refresh(changed);
+    }
+}
+
+function getResultList(elementId) {
+    if (!resultLists[elementId]) {
+        resultLists[elementId] = createVirtualList(document.getElementById(elementId), (text) => {
+            const item = document.createElement("li");
+            item.textContent = text;
+            item.title = text;
+            return item;
+        });
+    }
+
+    return resultLists[elementId];
+}
+
 function togglePlaybackButtons(mode, activeState) {
     const states = {
         spotify: ["downloadBtn", "stopBtn", "resumeBtn"],
@@ -110,7 +326,8 @@ function togglePlaybackButtons(mode, activeState) {
         const isTarget = key === mode;
 
         document.getElementById(downloadId).disabled = isTarget && activeState === "downloading";
-        document.getElementById(stopId).hidden = !(isTarget && activeState === "downloading");
+        // Queued jobs run on the workers and cannot be paused from here
+        document.getElementById(stopId).hidden = jobQueue || !(isTarget && activeState === "downloading");
         document.getElementById(resumeId).hidden = !(isTarget && activeState === "paused");
     });
 }
@@ -120,8 +337,8 @@ function resetProgressPanel() {
     document.getElementById("progressBar").textContent = "";
     document.getElementById("progressText").textContent = "Waiting for the download to start.";
     document.getElementById("currentTrack").textContent = "";
-    document.getElementById("completedList").innerHTML = "";
-    document.getElementById("failedList").innerHTML = "";
+    getResultList("completedList").setItems([]);
+    getResultList("failedList").setItems([]);
     document.getElementById("completedCount").textContent = "0";
     document.getElementById("failedCount").textContent = "0";
 }
@@ -144,26 +361,84 @@ function renderProgress(progress) {
         ? `Current item: ${progress.current_track}`
         : "";
 
-    const completedList = document.getElementById("completedList");
-    completedList.innerHTML = "";
-    progress.completed.forEach((track) => {
-        const item = document.createElement("li");
-        item.textContent = track;
-        completedList.appendChild(item);
-    });
-
-    const failedList = document.getElementById("failedList");
-    failedList.innerHTML = "";
-    progress.failed.forEach((item) => {
-        const failedItem = document.createElement("li");
-        failedItem.textContent = `${item.track} (${item.reason})`;
-        failedList.appendChild(failedItem);
-    });
+    getResultList("completedList").setItems(progress.completed);
+    getResultList("failedList").setItems(progress.failed.map((item) => `${item.track} (${item.reason})`));
+    updateTrackStatuses(progress);
 
     document.getElementById("completedCount").textContent = String(progress.completed.length);
     document.getElementById("failedCount").textContent = String(progress.failed.length);
 }
 
+function jobTaskKey(task) {
+    return task.artist ? `${task.artist} - ${task.title}` : task.title;
+}
+
+function progressFromJob(job) {
+    const running = job.tasks.find((task) => task.status === "running");
+    const isActive = job.status === "queued" || job.status === "running";
+
+    return {
+        current: job.completed + job.failed,
+        total: job.total,
+        current_track: running ? jobTaskKey(running) : "",
+        status: isActive ? "downloading" : "completed",
+        completed: job.tasks.filter((task) => task.status === "completed").map(jobTaskKey),
+        failed: job.tasks
+            .filter((task) => task.status === "failed")
+            .map((task) => ({ track: jobTaskKey(task), reason: task.error_message || "Download failed" })),
+    };
+}
+
+async function runJob(body, onProgress = null) {
+    const response = await fetch("/api/jobs", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(body),
+    });
+
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || "Failed to queue the download.");
+    }
+
+    while (true) {
+        const jobResponse = await fetch(`/api/jobs/${data.job_id}`);
+        const job = await jobResponse.json();
+        if (!jobResponse.ok) {
+            throw new Error(job.error || "Failed to load the download progress.");
+        }
+
+        if (onProgress) {
+            onProgress(progressFromJob(job));
+        }
+
+        if (job.status !== "queued" && job.status !== "running") {
+            return job;
+        }
+
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+}
+
+async function saveJobFiles(job, archiveName = null) {
+    // A single video is saved as itself, playlists as one ZIP
+    const finished = job.tasks.filter((task) => task.download_url);
+    if (!finished.length) {
+        return null;
+    }
+
+    const url = archiveName ? `/api/jobs/${job.id}/archive` : finished[0].download_url;
+    const response = await fetch(url);
+    const blob = await response.blob();
+    if (!response.ok) {
+        throw new Error(await parseBlobError(blob));
+    }
+
+    const filename = archiveName || finished[0].artifact_path.split("/").pop();
+    downloadBlob(blob, filename);
+    return filename;
+}
+
 function splitCsvLine(line) {
     const values = [];
     let current = "";
@@ -313,15 +588,13 @@ function displayPlaylistInfo(playlist) {
         image.removeAttribute("src");
     }
 
-    const trackList = document.getElementById("trackList");
-    trackList.innerHTML = "";
-
-    playlist.tracks.forEach((track, index) => {
-        const meta = track.album ? `${track.artist} • ${track.album}` : track.artist;
-        trackList.appendChild(createTrackRow(index, track.name, meta));
-    });
-
     info.hidden = false;
+    showTracks("trackList", playlist.tracks, (track) => ({
+        key: `${track.artist} - ${track.name}`,
+        title: track.name,
+        meta: track.album ? `${track.artist} • ${track.album}` : track.artist,
+    }));
+
     info.scrollIntoView({ behavior: "smooth", block: "start" });
 }
 
@@ -337,10 +610,27 @@ async function downloadPlaylist(resume = false) {
         resetProgressPanel();
     }
 
+    activeTrackView = trackViews.trackList || null;
     togglePlaybackButtons("spotify", "downloading");
-    startProgressPolling();
 
     try {
+        const format = document.querySelector('input[name="playlistFormat"]:checked').value;
+
+        if (jobQueue) {
+            const job = await runJob(
+                { playlist_name: importedPlaylist.name, tracks: importedPlaylist.tracks, format },
+                renderProgress
+            );
+            if (downloadLocation === "device") {
+                await saveJobFiles(job, `${importedPlaylist.name || "playlist"}.zip`);
+            }
+
+            togglePlaybackButtons("spotify", "idle");
+            showSuccess(`Downloaded ${job.completed} tracks.`);
+            return;
+        }
+
+        startProgressPolling();
         const response = await fetch("/api/download", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
@@ -349,7 +639,7 @@ async function downloadPlaylist(resume = false) {
                 tracks: importedPlaylist.tracks,
                 resume,
                 download_to_device: downloadLocation === "device",
-                format: document.querySelector('input[name="playlistFormat"]:checked').value,
+                format,
             }),
         });
 
@@ -459,42 +749,15 @@ async function downloadYouTube() {
     setInlineStatus("youtubeStatus", "Preparing your YouTube download...", "info");
 
     try {
-        const response = await fetch("/api/youtube/download", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({
-                youtube_url: youtubeUrl,
-                download_to_device: downloadLocation === "device",
-                format: document.querySelector('input[name="downloadFormat"]:checked').value,
-            }),
-        });
+        const format = document.querySelector('input[name="downloadFormat"]:checked').value;
 
-        if (downloadLocation === "device") {
-            const blob = await response.blob();
-            if (!response.ok) {
-                throw new Error(await parseBlobError(blob));
-            }
-
-            const disposition = response.headers.get("Content-Disposition") || "";
-            const match = /filename[^;=\n]*=((['"]).*?\2|[^;\n]*)/.exec(disposition);
-            const fallbackFormat = document.querySelector('input[name="downloadFormat"]:checked').value;
-            const filename = match && match[1]
-                ? match[1].replace(/['"]/g, "")
-                : `youtube-download.${fallbackFormat}`;
-
-            downloadBlob(blob, filename);
-            setInlineStatus("youtubeStatus", `Downloaded to device: ${filename}`, "success");
-            showSuccess("YouTube download complete.");
+        if (jobQueue) {
+            await downloadYouTubeQueued(youtubeUrl, format);
         } else {
-            const data = await response.json();
-            if (!response.ok) {
-                throw new Error(data.error || "YouTube download failed.");
-            }
-
-            setInlineStatus("youtubeStatus", data.message, "success");
-            showSuccess("YouTube download complete.");
+            await downloadYouTubeInProcess(youtubeUrl, format);
         }
 
+        showSuccess("YouTube download complete.");
         document.getElementById("youtubeUrl").value = "";
     } catch (error) {
         setInlineStatus("youtubeStatus", error.message, "error");
@@ -505,6 +768,55 @@ async function downloadYouTube() {
     }
 }
 
+async function downloadYouTubeQueued(youtubeUrl, format) {
+    const job = await runJob({ youtube_url: youtubeUrl, format });
+    if (job.status !== "completed") {
+        throw new Error(job.tasks[0].error_message || "YouTube download failed.");
+    }
+
+    if (downloadLocation === "device") {
+        const filename = await saveJobFiles(job);
+        setInlineStatus("youtubeStatus", `Downloaded to device: ${filename}`, "success");
+    } else {
+        setInlineStatus("youtubeStatus", `Successfully downloaded: ${job.tasks[0].title}`, "success");
+    }
+}
+
+async function downloadYouTubeInProcess(youtubeUrl, format) {
+    const response = await fetch("/api/youtube/download", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+            youtube_url: youtubeUrl,
+            download_to_device: downloadLocation === "device",
+            format,
+        }),
+    });
+
+    if (downloadLocation === "device") {
+        const blob = await response.blob();
+        if (!response.ok) {
+            throw new Error(await parseBlobError(blob));
+        }
+
+        const disposition = response.headers.get("Content-Disposition") || "";
+        const match = /filename[^;=\n]*=((['"]).*?\2|[^;\n]*)/.exec(disposition);
+        const filename = match && match[1]
+            ? match[1].replace(/['"]/g, "")
+            : `youtube-download.${format}`;
+
+        downloadBlob(blob, filename);
+        setInlineStatus("youtubeStatus", `Downloaded to device: ${filename}`, "success");
+    } else {
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || "YouTube download failed.");
+        }
+
+        setInlineStatus("youtubeStatus", data.message, "success");
+    }
+}
+
 function setDownloadLocation(location) {
     downloadLocation = location;
     document.getElementById("serverToggle").classList.toggle("active", location === "server");
@@ -517,6 +829,7 @@ async function loadConfig() {
         const config = await response.json();
 
         allowServerStorage = Boolean(config.allow_server_storage);
+        jobQueue = Boolean(config.job_queue);
         const toggleSection = document.querySelector(".download-location-toggle");
 
         if (!allowServerStorage) {
@@ -583,14 +896,13 @@ function displayYoutubePlaylistInfo(playlist) {
         image.removeAttribute("src");
     }
 
-    const list = document.getElementById("youtubeVideoList");
-    list.innerHTML = "";
-
-    playlist.videos.forEach((video, index) => {
-        list.appendChild(createTrackRow(index, video.title, video.channel));
-    });
-
     info.hidden = false;
+    showTracks("youtubeVideoList", playlist.videos, (video) => ({
+        key: video.title,
+        title: video.title,
+        meta: video.channel,
+    }));
+
     info.scrollIntoView({ behavior: "smooth", block: "start" });
 }
 
@@ -607,10 +919,24 @@ async function downloadYoutubePlaylist(resume = false) {
         resetProgressPanel();
     }
 
+    activeTrackView = trackViews.youtubeVideoList || null;
     togglePlaybackButtons("youtubePlaylist", "downloading");
-    startProgressPolling();
 
     try {
+        const format = document.querySelector('input[name="youtubePlaylistFormat"]:checked').value;
+
+        if (jobQueue) {
+            const job = await runJob({ playlist_url: playlistUrl, format }, renderProgress);
+            if (downloadLocation === "device") {
+                await saveJobFiles(job, "youtube-playlist.zip");
+            }
+
+            togglePlaybackButtons("youtubePlaylist", "idle");
+            showSuccess(`Downloaded ${job.completed} videos.`);
+            return;
+        }
+
+        startProgressPolling();
         const response = await fetch("/api/youtube/playlist/download", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
@@ -618,7 +944,7 @@ async function downloadYoutubePlaylist(resume = false) {
                 playlist_url: playlistUrl,
                 resume,
                 download_to_device: downloadLocation === "device",
-                format: document.querySelector('input[name="youtubePlaylistFormat"]:checked').value,
+                format,
             }),
         });
 
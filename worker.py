@@ -0,0 +1,189 @@
+"""Download worker for the shared job queue.
+
+Start as many as you like, on any machine that can reach the job store::
+
+    python -m worker --worker-id worker-1
+
+On the web app's host, with the same ``DATABASE_PATH`` and ``DOWNLOAD_FOLDER``,
+a worker writes files straight into the shared download folder. On other
+machines, point ``DATABASE_URL`` at the app's Postgres database and
+``--control-plane-url`` at the web app: each file is downloaded to a scratch
+folder and uploaded to the app, which then serves it like any other download.
+
+Each worker leases one task at a time, keeps the lease alive with heartbeats
+while yt-dlp runs, and publishes the finished file back to the job table.
+A worker that dies simply lets its lease expire and another picks the task up.
+"""
+import argparse
+import functools
+import os
+import posixpath
+import socket
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import database as db
+import library
+from downloader import track_filename, search_youtube_video, resolve_video, download_shared
+
+DOWNLOAD_FOLDER = os.getenv('DOWNLOAD_FOLDER', 'downloads')
+LEASE_SECONDS = int(os.getenv('WORKER_LEASE_SECONDS', 60))
+POLL_INTERVAL = float(os.getenv('WORKER_POLL_INTERVAL', 2))
+MAX_ATTEMPTS = int(os.getenv('WORKER_MAX_ATTEMPTS', 3))
+CONTROL_PLANE_URL = os.getenv('WORKER_CONTROL_PLANE_URL', '')
+
+# (connect, read) seconds for artifact uploads to the control plane
+UPLOAD_TIMEOUT = (10, 300)
+
+
+def download_task(task, download_folder=DOWNLOAD_FOLDER, control_plane_url=CONTROL_PLANE_URL):
+    """Download one leased task and return its artifact path relative to the app's download folder.
+
+    With ``control_plane_url`` the file is uploaded to the web app instead of
+    being left in download_folder.
+    """
+    filename = track_filename(task['title'], task['artist'])
+
+    if control_plane_url:
+        import shutil
+        import tempfile
+
+        # The app already skipped tracks in its library when it queued the job
+        scratch = tempfile.mkdtemp(prefix='worker-')
+        try:
+            output_path, video_id = fetch_task(task, os.path.join(scratch, filename))
+            return publish_artifact(control_plane_url, task, output_path, video_id)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    playlist_folder = os.path.join(download_folder, task['playlist_name'])
+    os.makedirs(playlist_folder, exist_ok=True)
+
+    # Re-synced playlists only fetch what is not already in the shared folder
+    output_path = library.find_track(playlist_folder, filename, task['format'])
+
+    if output_path is None:
+        output_path, video_id = fetch_task(task, os.path.join(playlist_folder, filename))
+        library.record_download(output_path, video_id, task['format'])
+
+    # Stored with forward slashes so it maps straight onto /downloads/<path>
+    return posixpath.join(task['playlist_name'], os.path.basename(output_path))
+
+
+def fetch_task(task, filepath):
+    """Resolve a task's video and download it to filepath; returns (output path, video ID)."""
+    video_url, video_id = resolve_video(
+        task['source_url'] or search_youtube_video(task['title'], task['artist'] or '')
+    )
+    if not video_url:
+        raise ValueError('YouTube video not found')
+
+    return download_shared(video_url, video_id, filepath, task['format']), video_id
+
+
+def publish_artifact(control_plane_url, task, output_path, video_id):
+    """Upload a finished file to the web app; returns the artifact path it serves it under."""
+    import requests
+
+    with open(output_path, 'rb') as handle:
+        response = requests.put(
+            f"{control_plane_url.rstrip('/')}/api/tasks/{task['id']}/artifact",
+            params={'name': os.path.basename(output_path), 'video_id': video_id or ''},
+            headers={'X-Lease-Token': task['lease_token']},
+            data=handle,
+            timeout=UPLOAD_TIMEOUT,
+        )
+
+    if not response.ok:
+        raise RuntimeError(f"Artifact upload failed ({response.status_code}): {response.text[:200]}")
+    return response.json()['artifact_path']
+
+
+class LeaseKeeper(threading.Thread):
+    """Renew a task lease in the background until stopped."""
+
+    def __init__(self, task, lease_seconds):
+        super().__init__(daemon=True)
+        self.task = task
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            if not db.heartbeat_task(self.task['id'], self.task['lease_token'], self.lease_seconds):
+                self.lost = True
+                return
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_worker(worker_id=None, download_func=download_task, lease_seconds=LEASE_SECONDS,
+               poll_interval=POLL_INTERVAL, max_attempts=MAX_ATTEMPTS, exit_when_idle=False):
+    """Claim and process tasks until interrupted; returns the number processed.
+
+    ``download_func(task)`` performs the download and returns the artifact path.
+    With ``exit_when_idle`` the worker stops as soon as the queue is empty.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    processed = 0
+
+    while True:
+        task = db.claim_task(worker_id, lease_seconds, max_attempts)
+
+        if task is None:
+            if exit_when_idle:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        keeper = LeaseKeeper(task, lease_seconds)
+        keeper.start()
+
+        try:
+            artifact_path = download_func(task)
+        except Exception as e:
+            keeper.stop()
+            print(f"[{worker_id}] Task {task['id']} failed: {e}")
+            db.fail_task(task['id'], task['lease_token'], str(e), max_attempts)
+        else:
+            keeper.stop()
+            if keeper.lost:
+                print(f"[{worker_id}] Lost lease on task {task['id']}; result discarded")
+            else:
+                db.complete_task(task['id'], task['lease_token'], artifact_path)
+
+        processed += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Process download tasks from the shared job queue.')
+    parser.add_argument('--worker-id', help='Name reported in task leases (default: host-pid)')
+    parser.add_argument('--lease-seconds', type=int, default=LEASE_SECONDS)
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL)
+    parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+    parser.add_argument('--exit-when-idle', action='store_true', help='Stop once the queue is empty')
+    parser.add_argument('--control-plane-url', default=CONTROL_PLANE_URL,
+                        help='Upload files to the web app at this URL instead of the local DOWNLOAD_FOLDER')
+    args = parser.parse_args()
+
+    db.init_db()
+    processed = run_worker(
+        worker_id=args.worker_id,
+        download_func=functools.partial(download_task, control_plane_url=args.control_plane_url),
+        lease_seconds=args.lease_seconds,
+        poll_interval=args.poll_interval,
+        max_attempts=args.max_attempts,
+        exit_when_idle=args.exit_when_idle,
+    )
+    print(f"Processed {processed} tasks")
+
+
+if __name__ == '__main__':
+    main()